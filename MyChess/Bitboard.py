@@ -0,0 +1,644 @@
+"""
+--> bitboard backend for GameState
+--> one 64 bit integer per piece type and color plus occupancy masks, kept in lists indexed by integers
+--> precomputed knight, king and pawn tables, sliding attacks cached per square and blocker set
+--> pawn moves generated for all pawns at once by shifting the pawn bitboard
+squares are numbered row * 8 + col, so square 0 is a8 and square 63 is h1
+"""
+from MyChess import ChessEngine
+from MyChess import Zobrist
+from MyChess import Evaluation
+from MyChess import MoveTables
+from MyChess.MoveTables import BETWEEN, BISHOP_DIRECTIONS, DIRECTIONS, KING_SQUARES, KNIGHT_SQUARES, ROOK_DIRECTIONS
+
+PIECES = ["wp", "wN", "wB", "wR", "wQ", "wK", "bp", "bN", "bB", "bR", "bQ", "bK"]
+PIECE_INDEX = {piece: i for i, piece in enumerate(PIECES)}  # position of every piece in pieceBitboards
+# piece type offsets, a white piece is at 0 + offset in pieceBitboards and a black piece at 6 + offset
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+COLOR_BASE = {"w": 0, "b": 6}
+FULL = (1 << 64) - 1
+NOT_FILE_A = sum(1 << sq for sq in range(64) if sq % 8 != 0)
+NOT_FILE_H = sum(1 << sq for sq in range(64) if sq % 8 != 7)
+ROW_MASKS = [0xFF << (row * 8) for row in range(8)]
+
+'''
+bitboard of (row, col) squares
+'''
+
+
+def squaresMask(squares):
+    mask = 0
+    for row, col in squares:
+        mask |= 1 << (row * 8 + col)
+    return mask
+
+
+KNIGHT_ATTACKS = [squaresMask(squares) for squares in KNIGHT_SQUARES]
+KING_ATTACKS = [squaresMask(squares) for squares in KING_SQUARES]
+# squares attacked by a pawn standing on the square, white first, then black
+PAWN_ATTACKS = [[squaresMask(MoveTables.targets(sq, offsets)) for sq in range(64)]
+                for offsets in (((-1, -1), (-1, 1)), ((1, -1), (1, 1)))]
+
+# a ray running towards higher square numbers finds its nearest blocker in the lowest bit
+POSITIVE = [d[0] * 8 + d[1] > 0 for d in DIRECTIONS]
+# RAYS[direction][square] = every square from square (exclusive) to the edge, MoveTables.RAYS as masks
+RAYS = [[squaresMask(MoveTables.RAYS[sq][d]) for sq in range(64)] for d in range(len(DIRECTIONS))]
+
+'''
+index of the lowest set bit
+'''
+
+
+def lowBit(bb):
+    return (bb & -bb).bit_length() - 1
+
+
+'''
+nearest occupied square from sq in direction d, -1 if the ray runs off the board
+'''
+
+
+def firstBlocker(d, sq, occupied):
+    blockers = RAYS[d][sq] & occupied
+    if not blockers:
+        return -1
+    if POSITIVE[d]:
+        return (blockers & -blockers).bit_length() - 1
+    return blockers.bit_length() - 1
+
+
+'''
+squares attacked along direction d, stopping at (and including) the first blocker
+'''
+
+
+def rayAttacks(d, sq, occupied):
+    ray = RAYS[d][sq]
+    blockers = ray & occupied
+    if blockers:
+        if POSITIVE[d]:
+            ray ^= RAYS[d][(blockers & -blockers).bit_length() - 1]
+        else:
+            ray ^= RAYS[d][blockers.bit_length() - 1]
+    return ray
+
+
+'''
+squares whose occupancy can change what a slider on sq attacks along directions, the last square of a ray never can
+'''
+
+
+def relevantMask(sq, directions):
+    mask = 0
+    for d in directions:
+        ray = RAYS[d][sq]
+        if ray:
+            edge = ray.bit_length() - 1 if POSITIVE[d] else lowBit(ray)
+            mask |= ray ^ (1 << edge)
+    return mask
+
+
+ROOK_MASKS = [relevantMask(sq, ROOK_DIRECTIONS) for sq in range(64)]
+BISHOP_MASKS = [relevantMask(sq, BISHOP_DIRECTIONS) for sq in range(64)]
+# attacks by square and relevant blockers, filled on first use, at most 4096 entries a square for rooks, 512 for bishops
+ROOK_TABLES = [{} for _ in range(64)]
+BISHOP_TABLES = [{} for _ in range(64)]
+
+
+def rookAttacks(sq, occupied):
+    blockers = occupied & ROOK_MASKS[sq]
+    attacks = ROOK_TABLES[sq].get(blockers)
+    if attacks is None:
+        attacks = ROOK_TABLES[sq][blockers] = rayAttacks(0, sq, blockers) | rayAttacks(1, sq, blockers) | \
+            rayAttacks(2, sq, blockers) | rayAttacks(3, sq, blockers)
+    return attacks
+
+
+def bishopAttacks(sq, occupied):
+    blockers = occupied & BISHOP_MASKS[sq]
+    attacks = BISHOP_TABLES[sq].get(blockers)
+    if attacks is None:
+        attacks = BISHOP_TABLES[sq][blockers] = rayAttacks(4, sq, blockers) | rayAttacks(5, sq, blockers) | \
+            rayAttacks(6, sq, blockers) | rayAttacks(7, sq, blockers)
+    return attacks
+
+
+class BitboardGameState(ChessEngine.GameState):
+    def __init__(self):
+        self.pieceBitboards = [0] * len(PIECES)  # indexed by PIECE_INDEX
+        self.occupancy = [0, 0]  # white pieces, black pieces
+        self.occupied = 0
+        self.squares = ["--"] * 64  # piece on each square, kept alongside the bitboards for captures
+        self.pieceLists = {"w": {}, "b": {}}
+        self.boardView = None
+        super().__init__()  # assigning self.board loads the bitboards
+
+    '''
+    8x8 list view of the position, rebuilt only after the position changed
+    the view is read only, writing to it does not change the bitboards
+    '''
+    @property
+    def board(self):
+        if self.boardView is None:
+            self.boardView = [self.squares[r * 8:r * 8 + 8] for r in range(8)]
+        return self.boardView
+
+    @board.setter
+    def board(self, board):
+        self.pieceBitboards = [0] * len(PIECES)
+        self.occupancy = [0, 0]
+        self.occupied = 0
+        self.squares = ["--"] * 64
+        self.pieceLists = {"w": {}, "b": {}}
+        for r in range(8):
+            for c in range(8):
+                if board[r][c] != "--":
+                    self.putPiece(r * 8 + c, board[r][c])
+        self.boardView = None
+
+    def pieceAt(self, r, c):
+        return self.squares[r * 8 + c]
+
+    def putPiece(self, sq, piece):
+        bit = 1 << sq
+        self.pieceBitboards[PIECE_INDEX[piece]] |= bit
+        self.occupancy[piece[0] == "b"] |= bit
+        self.occupied |= bit
+        self.squares[sq] = piece
+        self.pieceLists[piece[0]][sq] = piece
+
+    '''
+    executes a move, every bitboard it touches is changed with a single xor
+    '''
+    def makeMove(self, move):
+        enpassantBefore = self.enpassantPossible
+        castleBefore = Zobrist.castleIndex(self.currentCastleRight)
+        self.undoLog.append((move.pieceCaptured, castleBefore, enpassantBefore, self.halfmoveClock, self.zobristKey,
+                             self.mgScore, self.egScore, self.phase))
+        start = move.startRow * 8 + move.startCol
+        end = move.endRow * 8 + move.endCol
+        pieceMoved = move.pieceMoved
+        pieceCaptured = move.pieceCaptured
+        bb = self.pieceBitboards
+        squares = self.squares
+        us = not self.whiteToMove  # index into occupancy, 0 white and 1 black
+        allies = self.pieceLists[pieceMoved[0]]
+        if pieceCaptured != "--":
+            capturedSq = move.startRow * 8 + move.endCol if move.isEnpassantMove else end
+            bit = 1 << capturedSq
+            bb[PIECE_INDEX[pieceCaptured]] ^= bit
+            self.occupancy[not us] ^= bit
+            self.occupied ^= bit
+            squares[capturedSq] = "--"
+            del self.pieceLists[pieceCaptured[0]][capturedSq]
+        bits = 1 << start | 1 << end
+        if move.isPawnPromotion:
+            placed = pieceMoved[0] + move.promoteTo
+            bb[PIECE_INDEX[pieceMoved]] ^= 1 << start
+            bb[PIECE_INDEX[placed]] ^= 1 << end
+        else:
+            placed = pieceMoved
+            bb[PIECE_INDEX[pieceMoved]] ^= bits
+        self.occupancy[us] ^= bits
+        self.occupied ^= bits
+        squares[start] = "--"
+        squares[end] = placed
+        del allies[start]
+        allies[end] = placed
+        if move.isCastleMove:
+            if move.endCol - move.startCol == 2:  # king side castle
+                rookStart, rookEnd = end + 1, end - 1
+            else:  # queen side castle
+                rookStart, rookEnd = end - 2, end + 1
+            bits = 1 << rookStart | 1 << rookEnd
+            rook = squares[rookStart]
+            bb[PIECE_INDEX[rook]] ^= bits
+            self.occupancy[us] ^= bits
+            self.occupied ^= bits
+            squares[rookStart] = "--"
+            squares[rookEnd] = rook
+            del allies[rookStart]
+            allies[rookEnd] = rook
+        self.moveLog.append(move)
+        if pieceMoved[1] == 'p' and abs(move.startRow - move.endRow) == 2:
+            self.enpassantPossible = ((move.startRow + move.endRow) // 2, move.endCol)
+        else:
+            self.enpassantPossible = ()
+        if pieceMoved[1] == "p" or pieceCaptured != "--":
+            self.halfmoveClock = 0
+        else:
+            self.halfmoveClock += 1
+        if us:
+            self.fullmoveNumber += 1
+        if castleBefore:
+            self.updateCastleRights(move)
+            castleAfter = Zobrist.castleIndex(self.currentCastleRight)
+        else:
+            castleAfter = 0
+        if pieceMoved[1] == "K":
+            if us:
+                self.blackKingLocation = (move.endRow, move.endCol)
+            else:
+                self.whiteKingLocation = (move.endRow, move.endCol)
+        self.whiteToMove = not self.whiteToMove
+        self.zobristKey ^= Zobrist.moveDelta(move, enpassantBefore, self.enpassantPossible, castleBefore, castleAfter)
+        mg, eg, phase = Evaluation.moveDelta(move)
+        self.mgScore += mg
+        self.egScore += eg
+        self.phase += phase
+        self.boardView = None
+
+    '''
+    undo the last move
+    '''
+    def undoMove(self):
+        if len(self.moveLog) != 0:
+            move = self.moveLog.pop()
+            pieceCaptured, castleRights, self.enpassantPossible, self.halfmoveClock, self.zobristKey, self.mgScore, \
+                self.egScore, self.phase = self.undoLog.pop()
+            self.whiteToMove = not self.whiteToMove
+            start = move.startRow * 8 + move.startCol
+            end = move.endRow * 8 + move.endCol
+            pieceMoved = move.pieceMoved
+            bb = self.pieceBitboards
+            squares = self.squares
+            us = not self.whiteToMove
+            allies = self.pieceLists[pieceMoved[0]]
+            bits = 1 << start | 1 << end
+            if move.isPawnPromotion:
+                bb[PIECE_INDEX[pieceMoved]] ^= 1 << start
+                bb[PIECE_INDEX[squares[end]]] ^= 1 << end
+            else:
+                bb[PIECE_INDEX[pieceMoved]] ^= bits
+            self.occupancy[us] ^= bits
+            self.occupied ^= bits
+            squares[end] = "--"
+            squares[start] = pieceMoved
+            del allies[end]
+            allies[start] = pieceMoved
+            if pieceCaptured != "--":
+                capturedSq = move.startRow * 8 + move.endCol if move.isEnpassantMove else end
+                bit = 1 << capturedSq
+                bb[PIECE_INDEX[pieceCaptured]] ^= bit
+                self.occupancy[not us] ^= bit
+                self.occupied ^= bit
+                squares[capturedSq] = pieceCaptured
+                self.pieceLists[pieceCaptured[0]][capturedSq] = pieceCaptured
+            if move.isCastleMove:
+                if move.endCol - move.startCol == 2:  # king side castle
+                    rookStart, rookEnd = end + 1, end - 1
+                else:  # queen side castle
+                    rookStart, rookEnd = end - 2, end + 1
+                bits = 1 << rookStart | 1 << rookEnd
+                rook = squares[rookEnd]
+                bb[PIECE_INDEX[rook]] ^= bits
+                self.occupancy[us] ^= bits
+                self.occupied ^= bits
+                squares[rookEnd] = "--"
+                squares[rookStart] = rook
+                del allies[rookEnd]
+                allies[rookStart] = rook
+            if us:
+                self.fullmoveNumber -= 1
+            self.currentCastleRight.setMask(castleRights)
+            if pieceMoved[1] == "K":
+                if us:
+                    self.blackKingLocation = (move.startRow, move.startCol)
+                else:
+                    self.whiteKingLocation = (move.startRow, move.startCol)
+            self.checkMate = False
+            self.staleMate = False
+            self.boardView = None
+
+    '''
+    bitboard of the pieces at base (0 white, 6 black) in pieceBitboards attacking sq with the given occupancy
+    '''
+    def attackersTo(self, sq, base, occupied):
+        bb = self.pieceBitboards
+        attackers = (PAWN_ATTACKS[base == 0][sq] & bb[base + PAWN]) | (KNIGHT_ATTACKS[sq] & bb[base + KNIGHT]) | \
+            (KING_ATTACKS[sq] & bb[base + KING])
+        rooks = bb[base + ROOK] | bb[base + QUEEN]
+        if rooks:
+            attackers |= rookAttacks(sq, occupied) & rooks
+        bishops = bb[base + BISHOP] | bb[base + QUEEN]
+        if bishops:
+            attackers |= bishopAttacks(sq, occupied) & bishops
+        return attackers
+
+    '''
+    whether a piece at base in pieceBitboards attacks sq, the cheap tests first
+    '''
+    def attacked(self, sq, base, occupied):
+        bb = self.pieceBitboards
+        if PAWN_ATTACKS[base == 0][sq] & bb[base + PAWN] or KNIGHT_ATTACKS[sq] & bb[base + KNIGHT] or \
+                KING_ATTACKS[sq] & bb[base + KING]:
+            return True
+        rooks = bb[base + ROOK] | bb[base + QUEEN]
+        if rooks and rookAttacks(sq, occupied) & rooks:
+            return True
+        bishops = bb[base + BISHOP] | bb[base + QUEEN]
+        return bishops != 0 and bishopAttacks(sq, occupied) & bishops != 0
+
+    '''
+    (square, piece) of the cheapest piece of color attacking (r, c) once the pieces on removed are gone, or None
+    '''
+    def leastValuableAttacker(self, r, c, color, removed):
+        base = COLOR_BASE[color]
+        attackers = self.attackersTo(r * 8 + c, base, self.occupied & ~removed) & ~removed
+        if attackers:
+            for pieceType in range(6):
+                bb = attackers & self.pieceBitboards[base + pieceType]
+                if bb:
+                    return lowBit(bb), PIECES[base + pieceType]
+        return None
+
+    '''
+    static exchange evaluation like GameState.staticExchange, the attackers of the square are found once and only the
+    sliders behind a piece that joined the exchange are looked up again
+    '''
+    def staticExchange(self, move, values):
+        gains = [values[move.pieceCaptured[1]] if move.pieceCaptured != "--" else 0]
+        onSquare = values[move.pieceMoved[1]]  # worth of the piece the next capture takes
+        if move.isPawnPromotion:
+            gains[0] += values[move.promoteTo] - values["p"]
+            onSquare = values[move.promoteTo]
+        sq = move.endRow * 8 + move.endCol
+        promotes = sq < 8 or sq >= 56
+        bb = self.pieceBitboards
+        occupied = self.occupied ^ (1 << (move.startRow * 8 + move.startCol))
+        if move.isEnpassantMove:
+            occupied ^= 1 << (move.startRow * 8 + move.endCol)
+        attackers = (self.attackersTo(sq, 0, occupied) | self.attackersTo(sq, 6, occupied)) & occupied
+        diagonals = bb[BISHOP] | bb[QUEEN] | bb[6 + BISHOP] | bb[6 + QUEEN]
+        lines = bb[ROOK] | bb[QUEEN] | bb[6 + ROOK] | bb[6 + QUEEN]
+        base = 6 if move.pieceMoved[0] == "w" else 0  # side to recapture
+        while True:
+            own = attackers & self.occupancy[base != 0]
+            if not own:
+                break
+            for pieceType in range(6):
+                pieces = own & bb[base + pieceType]
+                if pieces:
+                    break
+            if pieceType == KING and attackers & self.occupancy[base == 0]:
+                break  # the King cannot take on a defended square
+            gains.append(onSquare - gains[-1])  # score of this capture if the exchange stopped after it
+            onSquare = values[PIECES[pieceType][1]]
+            if pieceType == PAWN and promotes:
+                gains[-1] += values["Q"] - values["p"]
+                onSquare = values["Q"]
+            occupied ^= pieces & -pieces
+            if pieceType == PAWN or pieceType == BISHOP or pieceType == QUEEN:
+                attackers |= bishopAttacks(sq, occupied) & diagonals
+            if pieceType == ROOK or pieceType == QUEEN:
+                attackers |= rookAttacks(sq, occupied) & lines
+            attackers &= occupied
+            base = 6 - base
+        while len(gains) > 1:  # each side may stop recapturing when going on would cost it
+            last = gains.pop()
+            gains[-1] = -max(-gains[-1], last)
+        return gains[0]
+
+    '''
+    determine if opponent can attack (r, c)
+    '''
+    def squareUnderAttack(self, r, c):
+        return self.attacked(r * 8 + c, 6 if self.whiteToMove else 0, self.occupied)
+
+    '''
+    for every pinned piece of the side to move, the squares it may still move to
+    '''
+    def getPinMasks(self, kingSq, base, enemyBase):
+        pinMasks = {}
+        bb = self.pieceBitboards
+        rooks = bb[enemyBase + ROOK] | bb[enemyBase + QUEEN]
+        bishops = bb[enemyBase + BISHOP] | bb[enemyBase + QUEEN]
+        if not (rookAttacks(kingSq, 0) & rooks or bishopAttacks(kingSq, 0) & bishops):
+            return pinMasks
+        own = self.occupancy[base != 0]
+        for d in range(8):
+            sliders = rooks if d < 4 else bishops
+            if not (RAYS[d][kingSq] & sliders):
+                continue
+            first = firstBlocker(d, kingSq, self.occupied)
+            if first == -1 or not (own >> first) & 1:
+                continue
+            second = firstBlocker(d, first, self.occupied)
+            if second != -1 and (sliders >> second) & 1:
+                pinMasks[first] = BETWEEN[kingSq][second] | (1 << second)
+        return pinMasks
+
+    '''
+    moves considering checks
+    '''
+    def getValidMoves(self):
+        moves = self.generateMoves(FULL)
+        if self.capturesOnly or self.quietOnly:  # no moves of one kind does not mean the game is over
+            return moves
+        if len(moves) == 0:
+            if self.inCheck:
+                self.checkMate = True
+            else:
+                self.staleMate = True
+        else:
+            self.checkMate = False
+            self.staleMate = False
+        return moves
+
+    '''
+    legal moves of the piece on (r, c) alone, generated from the bitboards like getValidMoves
+    '''
+    def getPieceMoves(self, r, c):
+        return self.generateMoves(1 << (r * 8 + c))
+
+    '''
+    legal moves of the pieces of the side to move standing on the squares set in fromMask
+    '''
+    def generateMoves(self, fromMask):
+        moves = []
+        base = 0 if self.whiteToMove else 6
+        enemyBase = 6 - base
+        bb = self.pieceBitboards
+        king = bb[base + KING]
+        kingSq = (king & -king).bit_length() - 1
+        occupied = self.occupied
+        checkers = self.attackersTo(kingSq, enemyBase, occupied)
+        self.inCheck = checkers != 0
+        own = self.occupancy[base != 0]
+        enemy = self.occupancy[base == 0]
+        if king & fromMask:
+            self.getKingMovesBB(kingSq, enemyBase, own, enemy, moves)
+        if checkers & (checkers - 1):  # double check leaves only king moves
+            return moves
+        if checkers:
+            checkMask = BETWEEN[kingSq][lowBit(checkers)] | checkers
+        else:
+            checkMask = FULL
+            if king & fromMask and not self.capturesOnly:
+                self.getCastleMovesBB(kingSq, enemyBase, moves)
+        pinMasks = self.getPinMasks(kingSq, base, enemyBase)
+        pinned = sum(1 << sq for sq in pinMasks) if pinMasks else 0
+        self.getPawnMovesBB(bb[base + PAWN] & fromMask, kingSq, base, enemyBase, checkMask, pinMasks, pinned, moves)
+        targetMask = ~own & checkMask
+        if self.capturesOnly:
+            targetMask &= enemy
+        elif self.quietOnly:
+            targetMask &= ~enemy
+        addMoves = self.addMoves
+        pieces = bb[base + KNIGHT] & fromMask & ~pinned  # a pinned knight can never move
+        while pieces:
+            sq = (pieces & -pieces).bit_length() - 1
+            pieces &= pieces - 1
+            addMoves(sq, KNIGHT_ATTACKS[sq] & targetMask, moves)
+        pieces = (bb[base + BISHOP] | bb[base + QUEEN]) & fromMask
+        while pieces:
+            sq = (pieces & -pieces).bit_length() - 1
+            pieces &= pieces - 1
+            targets = bishopAttacks(sq, occupied) & targetMask
+            if pinned >> sq & 1:
+                targets &= pinMasks[sq]
+            addMoves(sq, targets, moves)
+        pieces = (bb[base + ROOK] | bb[base + QUEEN]) & fromMask
+        while pieces:
+            sq = (pieces & -pieces).bit_length() - 1
+            pieces &= pieces - 1
+            targets = rookAttacks(sq, occupied) & targetMask
+            if pinned >> sq & 1:
+                targets &= pinMasks[sq]
+            addMoves(sq, targets, moves)
+        return moves
+
+    '''
+    append a move from sq to every square in targets
+    '''
+    def addMoves(self, sq, targets, moves):
+        squares = self.squares
+        pieceMoved = squares[sq]
+        startRow, startCol = sq >> 3, sq & 7
+        fromSquares = ChessEngine.Move.fromSquares
+        while targets:
+            end = (targets & -targets).bit_length() - 1
+            targets &= targets - 1
+            moves.append(fromSquares(startRow, startCol, end >> 3, end & 7, pieceMoved, squares[end]))
+
+    '''
+    append a pawn move to every square in targets, each from the square delta away, one move for every piece a pawn
+    can promote to on the last row
+    '''
+    def addPawnMoves(self, targets, delta, pieceMoved, moves):
+        squares = self.squares
+        fromSquares = ChessEngine.Move.fromSquares
+        while targets:
+            end = (targets & -targets).bit_length() - 1
+            targets &= targets - 1
+            start = end + delta
+            if end < 8 or end >= 56:
+                for piece in ("Q", "R", "B", "N"):
+                    moves.append(ChessEngine.Move.fromPieces(divmod(start, 8), divmod(end, 8), pieceMoved,
+                                                             squares[end], promoteTo=piece))
+            else:
+                moves.append(fromSquares(start >> 3, start & 7, end >> 3, end & 7, pieceMoved, squares[end]))
+
+    '''
+    all legal pawn moves of pawns including en passant, the unpinned pawns are moved together by shifting their bitboard
+    '''
+    def getPawnMovesBB(self, pawns, kingSq, base, enemyBase, checkMask, pinMasks, pinned, moves):
+        if not pawns:
+            return
+        if pawns & pinned:
+            free = pawns & ~pinned
+            if free:
+                self.pushAndCapture(free, base, checkMask, moves)
+            stuck = pawns & pinned
+            while stuck:
+                sq = (stuck & -stuck).bit_length() - 1
+                stuck &= stuck - 1
+                self.pushAndCapture(1 << sq, base, checkMask & pinMasks[sq], moves)
+        else:
+            self.pushAndCapture(pawns, base, checkMask, moves)
+        if self.enpassantPossible != () and not self.quietOnly:
+            epSq = self.enpassantPossible[0] * 8 + self.enpassantPossible[1]
+            # pawns that attack the square are the ones an enemy pawn on it would attack
+            candidates = PAWN_ATTACKS[base == 0][epSq] & pawns
+            forward = -8 if base == 0 else 8
+            capturedSq = epSq - forward
+            pawn = PIECES[base + PAWN]
+            while candidates:
+                sq = (candidates & -candidates).bit_length() - 1
+                candidates &= candidates - 1
+                # make the capture on the occupancy and look for any attack on the king, pins and checks included
+                occupiedAfter = (self.occupied ^ (1 << sq) ^ (1 << capturedSq)) | (1 << epSq)
+                if not self.attackersTo(kingSq, enemyBase, occupiedAfter) & ~(1 << capturedSq):
+                    moves.append(ChessEngine.Move.fromPieces(divmod(sq, 8), divmod(epSq, 8), pawn,
+                                                             PIECES[enemyBase + PAWN], isEnpassantMove=True))
+
+    '''
+    pushes and captures, en passant aside, of every pawn in pawns, ending on a square set in allowed
+    '''
+    def pushAndCapture(self, pawns, base, allowed, moves):
+        empty = ~self.occupied & FULL
+        enemy = self.occupancy[base == 0]
+        pawn = PIECES[base + PAWN]
+        if base == 0:  # white pawns move towards row 0
+            single = pawns >> 8 & empty
+            double = (single & ROW_MASKS[5]) >> 8 & empty
+            left = (pawns & NOT_FILE_A) >> 9 & enemy
+            right = (pawns & NOT_FILE_H) >> 7 & enemy
+            forward, leftDelta, rightDelta, promotionRow = -8, 9, 7, ROW_MASKS[0]
+        else:
+            single = pawns << 8 & empty
+            double = (single & ROW_MASKS[2]) << 8 & empty
+            left = (pawns & NOT_FILE_A) << 7 & enemy
+            right = (pawns & NOT_FILE_H) << 9 & enemy
+            forward, leftDelta, rightDelta, promotionRow = 8, -7, -9, ROW_MASKS[7]
+        if self.capturesOnly:  # only pushes that promote
+            single &= promotionRow
+            double = 0
+        elif self.quietOnly:  # only pushes that do not promote
+            single &= ~promotionRow
+            left = right = 0
+        addPawnMoves = self.addPawnMoves
+        addPawnMoves(left & allowed, leftDelta, pawn, moves)
+        addPawnMoves(right & allowed, rightDelta, pawn, moves)
+        addPawnMoves(single & allowed, -forward, pawn, moves)
+        addPawnMoves(double & allowed, -2 * forward, pawn, moves)
+
+    '''
+    all King moves that do not step into an attack
+    '''
+    def getKingMovesBB(self, kingSq, enemyBase, own, enemy, moves):
+        targets = KING_ATTACKS[kingSq] & ~own
+        if self.capturesOnly:
+            targets &= enemy
+        elif self.quietOnly:
+            targets &= ~enemy
+        occupiedWithoutKing = self.occupied ^ (1 << kingSq)
+        safe = 0
+        while targets:
+            sq = (targets & -targets).bit_length() - 1
+            targets &= targets - 1
+            if not self.attacked(sq, enemyBase, occupiedWithoutKing):
+                safe |= 1 << sq
+        self.addMoves(kingSq, safe, moves)
+
+    '''
+    castle moves, only called when the king is not in check
+    '''
+    def getCastleMovesBB(self, kingSq, enemyBase, moves):
+        if self.whiteToMove:
+            kingSide, queenSide = self.currentCastleRight.wks, self.currentCastleRight.wqs
+        else:
+            kingSide, queenSide = self.currentCastleRight.bks, self.currentCastleRight.bqs
+        if not (kingSide or queenSide):
+            return
+        occupied = self.occupied
+        king = self.squares[kingSq]
+        start = divmod(kingSq, 8)
+        if kingSide and not (occupied >> (kingSq + 1)) & 3 and \
+                not self.attacked(kingSq + 1, enemyBase, occupied) and \
+                not self.attacked(kingSq + 2, enemyBase, occupied):
+            moves.append(ChessEngine.Move.fromPieces(start, (start[0], start[1] + 2), king, "--", isCastleMove=True))
+        if queenSide and not (occupied >> (kingSq - 3)) & 7 and \
+                not self.attacked(kingSq - 1, enemyBase, occupied) and \
+                not self.attacked(kingSq - 2, enemyBase, occupied):
+            moves.append(ChessEngine.Move.fromPieces(start, (start[0], start[1] - 2), king, "--", isCastleMove=True))
@@ -3,6 +3,26 @@
 --> determine valid moves at current state
 --> keep a move log
 """
+from MyChess import Zobrist
+from MyChess import Evaluation
+from MyChess.MoveTables import DIRECTIONS, OPPOSITE, ROOK_DIRECTIONS, BISHOP_DIRECTIONS, RAYS, KNIGHT_SQUARES, \
+    KING_SQUARES, BETWEEN
+
+ATTACK_MAPS = False  # answer king safety and castling queries from a cached map of every attacked square
+ALL_SQUARES = (1 << 64) - 1  # check mask when not in check
+
+'''
+piece lists of a board: for each color a dict of square r * 8 + c to the piece standing there
+'''
+
+
+def pieceLists(board):
+    lists = {"w": {}, "b": {}}
+    for r in range(8):
+        for c in range(8):
+            if board[r][c] != "--":
+                lists[board[r][c][0]][r * 8 + c] = board[r][c]
+    return lists
 
 
 class GameState():
@@ -28,44 +48,142 @@ class GameState():
         self.blackKingLocation = (0, 4)
         self.pins = []
         self.checks = []
+        self.pinRays = [None] * 64  # pin direction of every pinned piece by square r * 8 + c, set by getValidMoves
+        self.checkMask = ALL_SQUARES  # bit r * 8 + c set where a piece other than the King may move to
         self.inCheck = False
         self.checkMate = False
         self.staleMate = False
+        self.capturesOnly = False  # generators skip quiet moves while set
+        self.quietOnly = False  # generators skip captures and promotions while set
         self.enpassantPossible = ()  # co-ordinates for the square
-        self.currentCastleRight = CastleRights(True, True, True, True)
-        self.castleRightsLog = [CastleRights(self.currentCastleRight.wks, self.currentCastleRight.bks,
-                                             self.currentCastleRight.wqs, self.currentCastleRight.bqs)]
-        self.whitePieces = ["wp", "wp", "wp", "wp", "wp", "wp", "wp", "wp",
-                            "wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"]
-        self.blackPieces = ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR",
-                            "bp", "bp", "bp", "bp", "bp", "bp", "bp", "bp"]
+        self.currentCastleRight = CastleRights(True, True, True, True)  # changed in place, never copied
+        # pieces of each color by square, changed in place by makeMove and undoMove so generators skip empty squares
+        self.pieceLists = pieceLists(self.board)
+        self.halfmoveClock = 0  # plies since the last capture or pawn move
+        self.fullmoveNumber = 1  # goes up after every black move
+        self.attackMaps = {"w": None, "b": None}  # squares attacked by each side, rebuilt lazily after a move
+        self.zobristKey = Zobrist.computeHash(self)
+        self.mgScore, self.egScore, self.phase = Evaluation.computeScores(self.board)
+        # one tuple a move with what undoMove cannot work out from the Move: captured piece, castling bitmask,
+        # en passant square, halfmove clock, zobrist key, middlegame score, endgame score and phase before the move
+        self.undoLog = []
+
+    '''
+    build a GameState from a FEN string
+    '''
+    @classmethod
+    def from_fen(cls, fen):
+        fields = fen.split()
+        rows = fields[0].split("/") if len(fields) >= 4 else []
+        if len(rows) != 8 or fields[1] not in ("w", "b"):
+            raise ValueError("invalid FEN: " + fen)
+        board = []
+        for rank in rows:
+            row = []
+            for char in rank:
+                if char.isdigit():
+                    row += ["--"] * int(char)
+                elif char.lower() in "pnbrqk":
+                    row.append(("w" if char.isupper() else "b") + (char.upper() if char.lower() != "p" else "p"))
+                else:
+                    raise ValueError("invalid piece " + char + " in FEN: " + fen)
+            if len(row) != 8:
+                raise ValueError("rank " + rank + " does not have 8 squares in FEN: " + fen)
+            board.append(row)
+        gs = cls()
+        gs.board = board
+        gs.pieceLists = pieceLists(board)
+        whiteKings = [sq for sq, piece in gs.pieceLists["w"].items() if piece == "wK"]
+        blackKings = [sq for sq, piece in gs.pieceLists["b"].items() if piece == "bK"]
+        if len(whiteKings) != 1 or len(blackKings) != 1:
+            raise ValueError("each side needs exactly one king in FEN: " + fen)
+        gs.whiteKingLocation = divmod(whiteKings[0], 8)
+        gs.blackKingLocation = divmod(blackKings[0], 8)
+        gs.whiteToMove = fields[1] == "w"
+        castling = fields[2]
+        # a right is dropped when its King or Rook is not on its home square, castling would move a missing piece
+        whiteKing, blackKing = board[7][4] == "wK", board[0][4] == "bK"
+        gs.currentCastleRight = CastleRights("K" in castling and whiteKing and board[7][7] == "wR",
+                                             "k" in castling and blackKing and board[0][7] == "bR",
+                                             "Q" in castling and whiteKing and board[7][0] == "wR",
+                                             "q" in castling and blackKing and board[0][0] == "bR")
+        if fields[3] != "-":
+            if len(fields[3]) != 2 or fields[3][0] not in Move.filesToCols or \
+                    fields[3][1] != ("6" if gs.whiteToMove else "3"):
+                raise ValueError("invalid en passant square " + fields[3] + " in FEN: " + fen)
+            gs.enpassantPossible = (Move.ranksToRows[fields[3][1]], Move.filesToCols[fields[3][0]])
+        gs.halfmoveClock = int(fields[4]) if len(fields) > 4 else 0
+        gs.fullmoveNumber = int(fields[5]) if len(fields) > 5 else 1
+        gs.zobristKey = Zobrist.computeHash(gs)
+        gs.mgScore, gs.egScore, gs.phase = Evaluation.computeScores(gs.board)
+        return gs
+
+    '''
+    FEN string of the current position
+    '''
+    def to_fen(self):
+        rows = []
+        for row in self.board:
+            text = ""
+            empty = 0
+            for piece in row:
+                if piece == "--":
+                    empty += 1
+                    continue
+                if empty != 0:
+                    text += str(empty)
+                    empty = 0
+                text += piece[1].upper() if piece[0] == "w" else piece[1].lower()
+            if empty != 0:
+                text += str(empty)
+            rows.append(text)
+        castling = ("K" if self.currentCastleRight.wks else "") + ("Q" if self.currentCastleRight.wqs else "") + \
+                   ("k" if self.currentCastleRight.bks else "") + ("q" if self.currentCastleRight.bqs else "")
+        if self.enpassantPossible != ():
+            enpassant = Move.colsToFiles[self.enpassantPossible[1]] + Move.rowsToRanks[self.enpassantPossible[0]]
+        else:
+            enpassant = "-"
+        return " ".join(["/".join(rows), "w" if self.whiteToMove else "b", castling if castling else "-", enpassant,
+                         str(self.halfmoveClock), str(self.fullmoveNumber)])
+
+    '''
+    piece on (r, c), "--" for an empty square
+    '''
+    def pieceAt(self, r, c):
+        return self.board[r][c]
 
     '''
     executes a move
     '''
     def makeMove(self, move):
+        self.attackMaps["w"] = self.attackMaps["b"] = None
+        enpassantBefore = self.enpassantPossible
+        castleBefore = Zobrist.castleIndex(self.currentCastleRight)
+        self.undoLog.append((move.pieceCaptured, castleBefore, enpassantBefore, self.halfmoveClock, self.zobristKey,
+                             self.mgScore, self.egScore, self.phase))
+        start = move.startRow * 8 + move.startCol
+        end = move.endRow * 8 + move.endCol
+        allies = self.pieceLists[move.pieceMoved[0]]
+        enemies = self.pieceLists["b" if move.pieceMoved[0] == "w" else "w"]
         self.board[move.startRow][move.startCol] = "--"
         self.board[move.endRow][move.endCol] = move.pieceMoved
+        del allies[start]
+        allies[end] = move.pieceMoved
+        if move.pieceCaptured != "--" and not move.isEnpassantMove:
+            del enemies[end]
         self.moveLog.append(move)  # log the move so that we can undo them later
         self.whiteToMove = not self.whiteToMove
 
         # promotion
         if move.isPawnPromotion:
-            self.board[move.endRow][move.endCol] = move.pieceMoved[0] + move.promoteTo
-            #if move.pieceMoved[0] == "w":
-            #    self.whitePieces.append("w" + move.promoteTo)
-            #    self.whitePieces.remove("wp")
-            #else:
-            #    self.blackPieces.append("b" + move.promoteTo)
-            #    self.blackPieces.remove("bp")
-            move.promoteTo = 'Q'
+            self.board[move.endRow][move.endCol] = allies[end] = move.pieceMoved[0] + move.promoteTo
         # En Passant
         if move.isEnpassantMove:
             self.board[move.startRow][move.endCol] = "--"
+            del enemies[move.startRow * 8 + move.endCol]
         # updating enpassantPossible
         if move.pieceMoved[1] == 'p' and abs(move.startRow - move.endRow) == 2:
             self.enpassantPossible = ((move.startRow + move.endRow) // 2, move.endCol)
-            move.enpassantPossible = self.enpassantPossible
         else:
             self.enpassantPossible = ()
         # castle move
@@ -74,66 +192,100 @@ class GameState():
                 if 1 <= move.endCol <= 6:
                     self.board[move.endRow][move.endCol - 1] = self.board[move.endRow][move.endCol + 1]  # rook moves
                     self.board[move.endRow][move.endCol + 1] = "--"  # remove rook
+                    allies[end - 1] = allies.pop(end + 1)
             else:  # queen side castle
                 if 2 <= move.endCol <= 6:
                     self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][move.endCol - 2]  # rook moves
                     self.board[move.endRow][move.endCol - 2] = "--"  # remove rook
+                    allies[end + 1] = allies.pop(end - 2)
+        # move counters
+        if move.pieceMoved[1] == "p" or move.pieceCaptured != "--":
+            self.halfmoveClock = 0
+        else:
+            self.halfmoveClock += 1
+        if move.pieceMoved[0] == "b":
+            self.fullmoveNumber += 1
         # updating castling rights whenever rook or king moves
         self.updateCastleRights(move)
-        self.castleRightsLog.append(CastleRights(self.currentCastleRight.wks, self.currentCastleRight.bks,
-                                                 self.currentCastleRight.wqs, self.currentCastleRight.bqs))
         if move.pieceMoved == "wK":
             self.whiteKingLocation = (move.endRow, move.endCol)
         if move.pieceMoved == "bK":
             self.blackKingLocation = (move.endRow, move.endCol)
+        self.zobristKey ^= Zobrist.moveDelta(move, enpassantBefore, self.enpassantPossible, castleBefore,
+                                             Zobrist.castleIndex(self.currentCastleRight))
+        mg, eg, phase = Evaluation.moveDelta(move)
+        self.mgScore += mg
+        self.egScore += eg
+        self.phase += phase
     '''
     undo the last move
     '''
 
     def undoMove(self):
         if len(self.moveLog) != 0:
+            self.attackMaps["w"] = self.attackMaps["b"] = None
             move = self.moveLog.pop()
+            pieceCaptured, castleRights, self.enpassantPossible, self.halfmoveClock, self.zobristKey, self.mgScore, \
+                self.egScore, self.phase = self.undoLog.pop()
+            start = move.startRow * 8 + move.startCol
+            end = move.endRow * 8 + move.endCol
+            allies = self.pieceLists[move.pieceMoved[0]]
+            enemies = self.pieceLists["b" if move.pieceMoved[0] == "w" else "w"]
+            del allies[end]
+            allies[start] = move.pieceMoved
             # undo enpassant
             if move.isEnpassantMove:
                 self.board[move.startRow][move.startCol] = move.pieceMoved
                 self.board[move.endRow][move.endCol] = "--"
-                self.board[move.startRow][move.endCol] = move.pieceCaptured
-                self.enpassantPossible = (move.endRow, move.endCol)
-                # print(self.enpassantPossible)
+                self.board[move.startRow][move.endCol] = pieceCaptured
+                enemies[move.startRow * 8 + move.endCol] = pieceCaptured
             else:
                 self.board[move.startRow][move.startCol] = move.pieceMoved
-                self.board[move.endRow][move.endCol] = move.pieceCaptured
+                self.board[move.endRow][move.endCol] = pieceCaptured
+                if pieceCaptured != "--":
+                    enemies[end] = pieceCaptured
 
             self.whiteToMove = not self.whiteToMove
-            if move.pieceMoved[1] == 'p' and abs(move.startRow - move.endRow) == 2:
-                self.enpassantPossible = ()
+            if move.pieceMoved[0] == "b":
+                self.fullmoveNumber -= 1
             # undo castling rights
-            self.castleRightsLog.pop()
-            newRights = self.castleRightsLog[-1]
-            self.currentCastleRight = CastleRights(newRights.wks, newRights.bks, newRights.wqs,
-                                                   newRights.bqs)  # set the castle rights to the last right in the log
+            self.currentCastleRight.setMask(castleRights)
             # undo castle
             if move.isCastleMove:
                 if move.endCol - move.startCol == 2:  # king side castle
                     if 1 <= move.endCol <= 6:
                         self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][move.endCol - 1]
                         self.board[move.endRow][move.endCol - 1] = "--"
+                        allies[end + 1] = allies.pop(end - 1)
                 else:  # queen side castle
                     if 2 <= move.endCol <= 6:
                         self.board[move.endRow][move.endCol - 2] = self.board[move.endRow][move.endCol + 1]
                         self.board[move.endRow][move.endCol + 1] = "--"
-                if self.whiteToMove:
-                    self.whiteKingLocation = (7, 4)
-                else:
-                    self.blackKingLocation = (0, 4)
-            else:
-                if move.pieceMoved == "wK":
-                    self.whiteKingLocation = (move.endRow, move.endCol)
-                if move.pieceMoved == "bK":
-                    self.blackKingLocation = (move.endRow, move.endCol)
+                        allies[end - 2] = allies.pop(end + 1)
+            if move.pieceMoved == "wK":
+                self.whiteKingLocation = (move.startRow, move.startCol)
+            if move.pieceMoved == "bK":
+                self.blackKingLocation = (move.startRow, move.startCol)
             self.checkMate = False
             self.staleMate = False
 
+    '''
+    pass the turn without moving, used by null move pruning, taken back with undoNullMove
+    '''
+    def makeNullMove(self):
+        self.attackMaps["w"] = self.attackMaps["b"] = None
+        self.undoLog.append((self.enpassantPossible, self.zobristKey))
+        if self.enpassantPossible != ():
+            self.zobristKey ^= Zobrist.ENPASSANT_KEYS[self.enpassantPossible[1]]
+            self.enpassantPossible = ()
+        self.zobristKey ^= Zobrist.SIDE_KEY
+        self.whiteToMove = not self.whiteToMove
+
+    def undoNullMove(self):
+        self.attackMaps["w"] = self.attackMaps["b"] = None
+        self.enpassantPossible, self.zobristKey = self.undoLog.pop()
+        self.whiteToMove = not self.whiteToMove
+
     '''
     updating castle rights
     '''
@@ -172,37 +324,16 @@ class GameState():
 
     def getValidMoves(self):
         moves = []
-        self.inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
-        kingRow = self.whiteKingLocation[0] if self.whiteToMove else self.blackKingLocation[0]
-        kingCol = self.whiteKingLocation[1] if self.whiteToMove else self.blackKingLocation[1]
-        if self.inCheck:
-            if len(self.checks) == 1:
-                moves = self.getAllPossibleMoves()
-                check = self.checks[0]  # check information
-                checkRow = check[0]
-                checkCol = check[1]
-                pieceChecking = self.board[checkRow][checkCol]  # enemy piece checking
-                validSquares = []  # squares where pieces can move
-                # if Knight, must capture Knight or move King, no blocks possible
-                if pieceChecking[1] == 'N':
-                    validSquares.append((checkRow, checkCol))
-                else:
-                    for i in range(1, 8):
-                        validSquare = (kingRow + check[2] * i, kingCol + check[3] * i)  # check[2], check[3] are
-                        # check directions
-                        validSquares.append(validSquare)
-                        if validSquare == (checkRow, checkCol):
-                            break
-                # get rid of any moves that don't block check or move king
-                for i in range(len(moves) - 1, -1, -1):  # go through the list in reverse
-                    if moves[i].pieceMoved[1] != "K":
-                        if not (moves[i].endRow, moves[i].endCol) in validSquares:
-                            moves.remove(moves[i])
-            else:
-                self.getKingMoves(kingRow, kingCol, moves)
+        kingRow, kingCol = self.startGeneration()
+        if self.inCheck and len(self.checks) > 1:  # double check, only the King can move
+            self.getKingMoves(kingRow, kingCol, moves)
         else:
-            moves = self.getAllPossibleMoves()
-            self.getCastleMoves(kingRow, kingCol, moves)
+            moves = self.getAllPossibleMoves()  # in check generators only emit moves that end the check
+            if not self.inCheck and not self.capturesOnly:
+                self.getCastleMoves(kingRow, kingCol, moves)
+        self.endGeneration()
+        if self.capturesOnly or self.quietOnly:  # no moves of one kind does not mean the game is over
+            return moves
         if len(moves) == 0:
             if self.inCheck:
                 self.checkMate = True
@@ -213,6 +344,66 @@ class GameState():
             self.staleMate = False
         return moves
 
+    '''
+    legal moves of the piece on (r, c) alone, used to check a single move without generating every move
+    '''
+    def getPieceMoves(self, r, c):
+        moves = []
+        kingRow, kingCol = self.startGeneration()
+        isKing = (r, c) == (kingRow, kingCol)
+        if isKing or not (self.inCheck and len(self.checks) > 1):
+            self.moveFunctions[self.board[r][c][1]](r, c, moves)
+            if isKing and not self.inCheck and not self.capturesOnly:
+                self.getCastleMoves(kingRow, kingCol, moves)
+        self.endGeneration()
+        return moves
+
+    '''
+    find pins and checks and set pinRays and checkMask for the generators, returns the square of the King to move
+    '''
+    def startGeneration(self):
+        self.inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
+        kingRow, kingCol = self.whiteKingLocation if self.whiteToMove else self.blackKingLocation
+        for pin in self.pins:
+            self.pinRays[pin[0] * 8 + pin[1]] = (pin[2], pin[3])
+        if len(self.checks) == 1:
+            checkRow, checkCol = self.checks[0][0], self.checks[0][1]
+            # if Knight, must capture Knight or move King, no blocks possible
+            if self.board[checkRow][checkCol][1] == 'N':
+                self.checkMask = 1 << (checkRow * 8 + checkCol)
+            else:  # capture the checker or block the squares in between
+                self.checkMask = BETWEEN[kingRow * 8 + kingCol][checkRow * 8 + checkCol] | \
+                    1 << (checkRow * 8 + checkCol)
+        return kingRow, kingCol
+
+    '''
+    undo startGeneration once the moves are generated
+    '''
+    def endGeneration(self):
+        for pin in self.pins:
+            self.pinRays[pin[0] * 8 + pin[1]] = None
+        self.checkMask = ALL_SQUARES
+
+    '''
+    captures and promotions considering checks, quiet moves are never generated
+    '''
+
+    def getCaptureMoves(self):
+        self.capturesOnly = True
+        moves = self.getValidMoves()
+        self.capturesOnly = False
+        return moves
+
+    '''
+    moves that neither capture nor promote considering checks, castling included, the rest of getCaptureMoves
+    '''
+
+    def getQuietMoves(self):
+        self.quietOnly = True
+        moves = self.getValidMoves()
+        self.quietOnly = False
+        return moves
+
     '''
     if current player is in check
     '''
@@ -228,26 +419,160 @@ class GameState():
     '''
 
     def squareUnderAttack(self, r, c):
-        self.whiteToMove = not self.whiteToMove  # switch player
-        oppMoves = self.getAllPossibleMoves()
-        self.whiteToMove = not self.whiteToMove  # switch it back
-        for move in oppMoves:
-            if move.endRow == r and move.endCol == c:
+        enemyColor = "b" if self.whiteToMove else "w"
+        if ATTACK_MAPS:
+            return self.attackMap(enemyColor) >> (r * 8 + c) & 1 == 1
+        return self.attackedBy(r, c, enemyColor)
+
+    '''
+    determine if a piece of color attacks (r, c) by looking outward from the square, nothing is allocated
+    '''
+    def attackedBy(self, r, c, color):
+        board = self.board
+        # pawns attack towards the other side, so look one row back from their point of view
+        pawnRow = r + 1 if color == "w" else r - 1
+        if 0 <= pawnRow <= 7:
+            pawn = color + "p"
+            if (c > 0 and board[pawnRow][c - 1] == pawn) or (c < 7 and board[pawnRow][c + 1] == pawn):
                 return True
+        sq = r * 8 + c
+        knight = color + "N"
+        for row, col in KNIGHT_SQUARES[sq]:
+            if board[row][col] == knight:
+                return True
+        king = color + "K"
+        for row, col in KING_SQUARES[sq]:
+            if board[row][col] == king:
+                return True
+        rays = RAYS[sq]
+        queen = color + "Q"
+        for directions, slider in ((ROOK_DIRECTIONS, color + "R"), (BISHOP_DIRECTIONS, color + "B")):
+            for d in directions:
+                for row, col in rays[d]:
+                    piece = board[row][col]
+                    if piece != "--":
+                        if piece == slider or piece == queen:
+                            return True
+                        break
         return False
 
+    '''
+    static exchange evaluation: material won by the side making move if both sides then keep recapturing on its end
+    square with their least valuable attacker for as long as it pays, x-ray attackers behind sliders included
+    values gives the worth of every piece letter, like SmartMoves.piecesPoints; pins are ignored, the board is
+    never changed
+    '''
+    def staticExchange(self, move, values):
+        gains = [values[move.pieceCaptured[1]] if move.pieceCaptured != "--" else 0]
+        onSquare = values[move.pieceMoved[1]]  # worth of the piece the next capture takes
+        if move.isPawnPromotion:
+            gains[0] += values[move.promoteTo] - values["p"]
+            onSquare = values[move.promoteTo]
+        removed = 1 << (move.startRow * 8 + move.startCol)  # squares whose piece has joined the exchange
+        if move.isEnpassantMove:
+            removed |= 1 << (move.startRow * 8 + move.endCol)
+        color = move.pieceMoved[0]
+        while True:
+            color = "b" if color == "w" else "w"
+            attacker = self.leastValuableAttacker(move.endRow, move.endCol, color, removed)
+            if attacker is None:
+                break
+            sq, piece = attacker
+            if piece[1] == "K" and self.leastValuableAttacker(move.endRow, move.endCol, "b" if color == "w" else "w",
+                                                              removed | 1 << sq) is not None:
+                break  # the King cannot take on a defended square
+            gains.append(onSquare - gains[-1])  # score of this capture if the exchange stopped after it
+            onSquare = values[piece[1]]
+            if piece[1] == "p" and (move.endRow == 0 or move.endRow == 7):
+                gains[-1] += values["Q"] - values["p"]
+                onSquare = values["Q"]
+            removed |= 1 << sq
+        while len(gains) > 1:  # each side may stop recapturing when going on would cost it
+            last = gains.pop()
+            gains[-1] = -max(-gains[-1], last)
+        return gains[0]
+
+    '''
+    (square, piece) of the cheapest piece of color attacking (r, c), None if there is none
+    pieces on the squares set in removed are gone, so the sliders behind them attack through
+    '''
+    def leastValuableAttacker(self, r, c, color, removed):
+        board = self.board
+        pawnRow = r + 1 if color == "w" else r - 1
+        if 0 <= pawnRow <= 7:
+            pawn = color + "p"
+            for col in (c - 1, c + 1):
+                if 0 <= col <= 7 and board[pawnRow][col] == pawn and not removed >> (pawnRow * 8 + col) & 1:
+                    return pawnRow * 8 + col, pawn
+        sq = r * 8 + c
+        knight = color + "N"
+        for row, col in KNIGHT_SQUARES[sq]:
+            if board[row][col] == knight and not removed >> (row * 8 + col) & 1:
+                return row * 8 + col, knight
+        sliders = {}  # piece letter: square of the first such slider found
+        rays = RAYS[sq]
+        for d in range(8):
+            slider = "R" if d < 4 else "B"
+            for row, col in rays[d]:
+                piece = board[row][col]
+                if piece != "--" and not removed >> (row * 8 + col) & 1:
+                    if piece[0] == color and (piece[1] == slider or piece[1] == "Q"):
+                        sliders.setdefault(piece[1], row * 8 + col)
+                    break
+        for slider in "BRQ":
+            if slider in sliders:
+                return sliders[slider], color + slider
+        king = color + "K"
+        for row, col in KING_SQUARES[sq]:
+            if board[row][col] == king and not removed >> (row * 8 + col) & 1:
+                return row * 8 + col, king
+        return None
+
+    '''
+    bitmask of every square attacked by color, bit r * 8 + c, cached until the next move
+    the other king does not block sliders, so squares behind it along a check ray count as attacked
+    '''
+    def attackMap(self, color):
+        attacks = self.attackMaps[color]
+        if attacks is not None:
+            return attacks
+        attacks = 0
+        board = self.board
+        transparent = ("b" if color == "w" else "w") + "K"
+        pawnStep = -1 if color == "w" else 1
+        for sq, piece in self.pieceLists[color].items():
+            r, c = divmod(sq, 8)
+            pieceType = piece[1]
+            if pieceType == "p":
+                row = r + pawnStep
+                if 0 <= row <= 7:
+                    if c > 0:
+                        attacks |= 1 << (row * 8 + c - 1)
+                    if c < 7:
+                        attacks |= 1 << (row * 8 + c + 1)
+            elif pieceType == "N" or pieceType == "K":
+                for row, col in (KNIGHT_SQUARES[sq] if pieceType == "N" else KING_SQUARES[sq]):
+                    attacks |= 1 << (row * 8 + col)
+            else:
+                directions = ROOK_DIRECTIONS if pieceType == "R" else BISHOP_DIRECTIONS if pieceType == "B" \
+                    else range(8)
+                for d in directions:
+                    for row, col in RAYS[sq][d]:
+                        attacks |= 1 << (row * 8 + col)
+                        if board[row][col] != "--" and board[row][col] != transparent:
+                            break
+        self.attackMaps[color] = attacks
+        return attacks
+
     '''
     moves without considering checks
     '''
 
     def getAllPossibleMoves(self):
         moves = []
-        for r in range(len(self.board)):  # rows
-            for c in range(len(self.board[r])):  # cols
-                turn = self.board[r][c][0]
-                if (turn == "w" and self.whiteToMove) or (turn == "b" and not self.whiteToMove):
-                    piece = self.board[r][c][1]
-                    self.moveFunctions[piece](r, c, moves)
+        moveFunctions = self.moveFunctions
+        for sq, piece in self.pieceLists["w" if self.whiteToMove else "b"].items():
+            moveFunctions[piece[1]](sq >> 3, sq & 7, moves)
         return moves
 
     '''
@@ -255,93 +580,102 @@ class GameState():
     '''
 
     def getPawnMoves(self, r, c, moves):
-        piecePinned = False
-        pinDirection = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piecePinned = True
-                pinDirection = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
-        if len(self.moveLog) != 0:
-            lastMove = self.moveLog[-1]
-            if self.enpassantPossible == () and not lastMove.enpassantPossible == ():
-                self.enpassantPossible = lastMove.enpassantPossible
+        pinDirection = self.pinRays[r * 8 + c]
+        piecePinned = pinDirection is not None
+        checkMask = self.checkMask
         if self.whiteToMove:
-            if r > 0 and self.board[r - 1][c] == "--":  # one square move
-                if not piecePinned or pinDirection == (-1, 0):
-                    moves.append(Move((r, c), (r - 1, c), self.board))
-                    if r == 6 and self.board[r - 2][c] == "--":  # two square move
-                        moves.append(Move((r, c), (r - 2, c), self.board))
-            if c - 1 >= 0:  # left capture
-                if self.board[r - 1][c - 1][0] == 'b':
-                    if not piecePinned or pinDirection == (-1, -1):
-                        moves.append(Move((r, c), (r - 1, c - 1), self.board))
-                elif (r - 1, c - 1) == self.enpassantPossible:
-                    if not piecePinned or pinDirection == (-1, -1):
-                        moves.append(Move((r, c), (r - 1, c - 1), self.board, isEnpassantMove=True))
-            if c + 1 <= 7:  # right capture
-                if self.board[r - 1][c + 1][0] == 'b':
-                    if not piecePinned or pinDirection == (-1, 1):
-                        moves.append(Move((r, c), (r - 1, c + 1), self.board))
-                elif (r - 1, c + 1) == self.enpassantPossible:
-                    if not piecePinned or pinDirection == (-1, 1):
-                        moves.append(Move((r, c), (r - 1, c + 1), self.board, isEnpassantMove=True))
+            moveAmount, startRow, enemyColor = -1, 6, "b"
         else:
-            if r < 7 and self.board[r + 1][c] == "--":  # one square empty
-                if not piecePinned or pinDirection == (1, 0):
-                    moves.append(Move((r, c), (r + 1, c), self.board))
-                    if r == 1 and self.board[r + 2][c] == "--":
-                        moves.append(Move((r, c), (r + 2, c), self.board))
-            if c - 1 >= 0:  # left capture
-                if self.board[r + 1][c - 1][0] == 'w':
-                    if not piecePinned or pinDirection == (1, -1):
-                        moves.append(Move((r, c), (r + 1, c - 1), self.board))
-                if (r + 1, c - 1) == self.enpassantPossible:
-                    if not piecePinned or pinDirection == (1, -1):
-                        moves.append(Move((r, c), (r + 1, c - 1), self.board, isEnpassantMove=True))
-            if c + 1 <= 7:  # right capture
-                if self.board[r + 1][c + 1][0] == 'w':
-                    if not piecePinned or pinDirection == (1, 1):
-                        moves.append(Move((r, c), (r + 1, c + 1), self.board))
-                if (r + 1, c + 1) == self.enpassantPossible:
-                    if not piecePinned or pinDirection == (1, 1):
-                        moves.append(Move((r, c), (r + 1, c + 1), self.board, isEnpassantMove=True))
-        # add promotions
+            moveAmount, startRow, enemyColor = 1, 1, "w"
+        endRow = r + moveAmount
+        promotes = endRow == 0 or endRow == 7
+        # a pinned pawn may still move along the pin, towards or away from its king
+        # one square move, a push that promotes is not quiet and one that does not is not a capture
+        if self.board[endRow][c] == "--" and (not self.quietOnly if promotes else not self.capturesOnly):
+            if not piecePinned or pinDirection == (moveAmount, 0) or pinDirection == (-moveAmount, 0):
+                if checkMask >> (endRow * 8 + c) & 1:
+                    self.addPawnMove((r, c), (endRow, c), moves)
+                if r == startRow and self.board[r + 2 * moveAmount][c] == "--" and \
+                        checkMask >> ((r + 2 * moveAmount) * 8 + c) & 1:  # two square move
+                    moves.append(Move.fromSquares(r, c, r + 2 * moveAmount, c, self.board[r][c], "--"))
+        if self.quietOnly:
+            return
+        for d in (-1, 1):  # left and right capture
+            endCol = c + d
+            if 0 <= endCol <= 7:
+                if not piecePinned or pinDirection == (moveAmount, d) or pinDirection == (-moveAmount, -d):
+                    if self.board[endRow][endCol][0] == enemyColor:
+                        if checkMask >> (endRow * 8 + endCol) & 1:
+                            self.addPawnMove((r, c), (endRow, endCol), moves)
+                    # en passant can also end a check by taking the checking pawn off r, endCol
+                    elif (endRow, endCol) == self.enpassantPossible and \
+                            (checkMask >> (endRow * 8 + endCol) & 1 or checkMask >> (r * 8 + endCol) & 1) and \
+                            not self.enpassantExposesKing(r, c, endCol):
+                        moves.append(Move((r, c), (endRow, endCol), self.board, isEnpassantMove=True))
+
+    '''
+    add a pawn move, one move for every piece when the pawn promotes
+    '''
+
+    def addPawnMove(self, startSq, endSq, moves):
+        if endSq[0] == 0 or endSq[0] == 7:
+            for piece in ("Q", "R", "B", "N"):
+                moves.append(Move(startSq, endSq, self.board, promoteTo=piece))
+        else:
+            moves.append(Move.fromSquares(startSq[0], startSq[1], endSq[0], endSq[1], self.board[startSq[0]][startSq[1]],
+                                          self.board[endSq[0]][endSq[1]]))
+
+    '''
+    en passant takes two pawns off the king's row at once, which no pin can see
+    '''
+
+    def enpassantExposesKing(self, r, c, capturedCol):
+        kingRow, kingCol = self.whiteKingLocation if self.whiteToMove else self.blackKingLocation
+        if kingRow != r:
+            return False
+        enemyColor = "b" if self.whiteToMove else "w"
+        step = 1 if c > kingCol else -1
+        col = kingCol + step
+        while 0 <= col <= 7:
+            if col != c and col != capturedCol:
+                endPiece = self.board[r][col]
+                if endPiece != "--":
+                    return endPiece[0] == enemyColor and (endPiece[1] == "R" or endPiece[1] == "Q")
+            col += step
+        return False
 
     '''
     all Rook moves
     '''
 
     def getRookMoves(self, r, c, moves):
-        piecePinned = False
-        pinDirection = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piecePinned = True
-                pinDirection = (self.pins[i][2], self.pins[i][3])
-                if self.board[r][c][1] != "Q":  # cannot remove queen from pin on rook moves, only remove it on
-                    # Bishop moves
-                    self.pins.remove(self.pins[i])
-                break
-        direction = [(-1, 0), (0, -1), (1, 0), (0, 1)]
+        self.getSliderMoves(r, c, ROOK_DIRECTIONS, moves)
+
+    '''
+    moves of a Rook, Bishop or Queen along the given directions, read from the precomputed rays
+    '''
+
+    def getSliderMoves(self, r, c, directions, moves):
+        pinDirection = self.pinRays[r * 8 + c]
+        checkMask = self.checkMask
+        capturesOnly = self.capturesOnly
+        quietOnly = self.quietOnly
+        board = self.board
         enemyPiece = "b" if self.whiteToMove else "w"
-        for d in direction:
-            for i in range(1, 8):
-                row = r + d[0] * i
-                col = c + d[1] * i
-                if 0 <= row <= 7 and 0 <= col <= 7:  # on board
-                    if not piecePinned or pinDirection == d or pinDirection == (-d[0], -d[1]):  # piece direction is
-                        # towards the pin direction or away from it
-                        endPiece = self.board[row][col]
-                        if endPiece == "--":
-                            moves.append(Move((r, c), (row, col), self.board))
-                        elif endPiece[0] == enemyPiece:
-                            moves.append(Move((r, c), (row, col), self.board))
-                            break
-                        else:
-                            break
-                else:  # off board
+        pieceMoved = board[r][c]
+        rays = RAYS[r * 8 + c]
+        for d in directions:
+            # a pinned piece may only move towards the pinning piece or back towards its king
+            if pinDirection is not None and pinDirection != DIRECTIONS[d] and pinDirection != OPPOSITE[d]:
+                continue
+            for row, col in rays[d]:
+                endPiece = board[row][col]
+                if endPiece == "--":
+                    if not capturesOnly and checkMask >> (row * 8 + col) & 1:
+                        moves.append(Move.fromSquares(r, c, row, col, pieceMoved, endPiece))
+                else:
+                    if endPiece[0] == enemyPiece and not quietOnly and checkMask >> (row * 8 + col) & 1:
+                        moves.append(Move.fromSquares(r, c, row, col, pieceMoved, endPiece))
                     break
 
     '''
@@ -349,81 +683,44 @@ class GameState():
     '''
 
     def getKnightMoves(self, r, c, moves):
-        piecePinned = False
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piecePinned = True
-                self.pins.remove(self.pins[i])
-                break
-
-        direction = [(1, 2), (1, -2), (-1, 2), (-1, -2), (2, -1), (2, 1), (-2, 1), (-2, -1)]
+        if self.pinRays[r * 8 + c] is not None:  # a pinned Knight can never move
+            return
+        checkMask = self.checkMask
         ownPiece = "w" if self.whiteToMove else "b"
-        for d in direction:
-            row = r + d[0]
-            col = c + d[1]
-            if 0 <= row <= 7 and 0 <= col <= 7:
-                if not piecePinned:
-                    endPiece = self.board[row][col]
-                    if endPiece[0] != ownPiece:
-                        moves.append(Move((r, c), (row, col), self.board))
+        pieceMoved = self.board[r][c]
+        for row, col in KNIGHT_SQUARES[r * 8 + c]:
+            if checkMask >> (row * 8 + col) & 1:
+                endPiece = self.board[row][col]
+                if endPiece[0] != ownPiece and (not self.quietOnly if endPiece != "--" else not self.capturesOnly):
+                    moves.append(Move.fromSquares(r, c, row, col, pieceMoved, endPiece))
 
     '''
     all Bishop moves
     '''
 
     def getBishopMoves(self, r, c, moves):
-        piecePinned = False
-        pinDirection = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piecePinned = True
-                pinDirection = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
-        direction = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
-        enemyPiece = "b" if self.whiteToMove else "w"
-        for d in direction:
-            for i in range(1, 8):
-                row = r + d[0] * i
-                col = c + d[1] * i
-                if 0 <= row <= 7 and 0 <= col <= 7:
-                    if not piecePinned or pinDirection == d or pinDirection == (-d[0], -d[1]):
-                        endPiece = self.board[row][col]
-                        if endPiece == "--":
-                            moves.append(Move((r, c), (row, col), self.board))
-                        elif endPiece[0] == enemyPiece:
-                            moves.append(Move((r, c), (row, col), self.board))
-                            break
-                        else:
-                            break
-                else:
-                    break
+        self.getSliderMoves(r, c, BISHOP_DIRECTIONS, moves)
 
     '''
     all King moves
     '''
 
     def getKingMoves(self, r, c, moves):
-        direction = [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (-1, -1), (1, -1), (-1, 1)]
         ownPiece = "w" if self.whiteToMove else "b"
-        for d in direction:
-            row = r + d[0]
-            col = c + d[1]
-            if 0 <= row <= 7 and 0 <= col <= 7:
-                endPiece = self.board[row][col]
-                if endPiece[0] != ownPiece:
-                    # temporarily move the King a look for checks
-                    if ownPiece == "w":
-                        self.whiteKingLocation = (row, col)
-                    else:
-                        self.blackKingLocation = (row, col)
-                    inCheck, pins, checks = self.checkForPinsAndChecks()
-                    if not inCheck:
-                        moves.append(Move((r, c), (row, col), self.board))
-                    if ownPiece == "w":
-                        self.whiteKingLocation = (r, c)
-                    else:
-                        self.blackKingLocation = (r, c)
+        enemyColor = "b" if self.whiteToMove else "w"
+        attacks = self.attackMap(enemyColor) if ATTACK_MAPS else 0
+        king = self.board[r][c]
+        self.board[r][c] = "--"  # lift the King so it does not hide squares behind it from sliders
+        for row, col in KING_SQUARES[r * 8 + c]:
+            endPiece = self.board[row][col]
+            if endPiece[0] != ownPiece and (not self.quietOnly if endPiece != "--" else not self.capturesOnly):
+                if ATTACK_MAPS:
+                    attacked = attacks >> (row * 8 + col) & 1 == 1
+                else:
+                    attacked = self.attackedBy(row, col, enemyColor)
+                if not attacked:
+                    moves.append(Move.fromSquares(r, c, row, col, king, endPiece))
+        self.board[r][c] = king
     '''
     generate all valid castle moves and add them to the list of moves
     '''
@@ -447,8 +744,7 @@ class GameState():
     '''
 
     def getQueenMoves(self, r, c, moves):
-        self.getRookMoves(r, c, moves)
-        self.getBishopMoves(r, c, moves)
+        self.getSliderMoves(r, c, range(8), moves)
 
     '''
     returns if player's in check, list of pins, list of checks
@@ -462,49 +758,42 @@ class GameState():
         allyColor = "w" if self.whiteToMove else "b"
         startRow = self.whiteKingLocation[0] if self.whiteToMove else self.blackKingLocation[0]
         startCol = self.whiteKingLocation[1] if self.whiteToMove else self.blackKingLocation[1]
-        directions = [(-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
-        for j in range(len(directions)):
-            d = directions[j]
+        rays = RAYS[startRow * 8 + startCol]
+        for j in range(8):
+            d = DIRECTIONS[j]
             possiblePin = ()  # reset possible pins
-            for i in range(1, 8):
-                endRow = startRow + d[0] * i
-                endCol = startCol + d[1] * i
-                if 0 <= endCol <= 7 and 0 <= endRow <= 7:
-                    endPiece = self.board[endRow][endCol]
-                    if endPiece[0] == allyColor and endPiece[1] != "K":
+            i = 0
+            for endRow, endCol in rays[j]:
+                i += 1
+                endPiece = self.board[endRow][endCol]
+                if endPiece[0] == allyColor and endPiece[1] != "K":
+                    if possiblePin == ():
+                        possiblePin = (endRow, endCol, d[0], d[1])
+                    else:
+                        break
+                elif endPiece[0] == enemyColor:
+                    pieceType = endPiece[1]
+                    # five possible case :
+                    if (0 <= j <= 3 and pieceType == "R") or \
+                            (4 <= j <= 7 and pieceType == "B") or \
+                            (i == 1 and pieceType == 'p' and (
+                                    (enemyColor == "w" and 6 <= j <= 7) or (enemyColor == "b" and 4 <= j <= 5))) or \
+                            (pieceType == "Q") or (i == 1 and pieceType == "K"):
                         if possiblePin == ():
-                            possiblePin = (endRow, endCol, d[0], d[1])
-                        else:
+                            inCheck = True
+                            checks.append((endRow, endCol, d[0], d[1]))
                             break
-                    elif endPiece[0] == enemyColor:
-                        pieceType = endPiece[1]
-                        # five possible case :
-                        if (0 <= j <= 3 and pieceType == "R") or \
-                                (4 <= j <= 7 and pieceType == "B") or \
-                                (i == 1 and pieceType == 'p' and (
-                                        (enemyColor == "w" and 6 <= j <= 7) or (enemyColor == "b" and 4 <= j <= 5))) or \
-                                (pieceType == "Q") or (i == 1 and pieceType == "K"):
-                            if possiblePin == ():
-                                inCheck = True
-                                checks.append((endRow, endCol, d[0], d[1]))
-                                break
-                            else:  # piece blocking so pin
-                                pins.append(possiblePin)
-                                break
-                        else:  # enemy piece not applying check
+                        else:  # piece blocking so pin
+                            pins.append(possiblePin)
                             break
-                else:  # off board
-                    break
+                    else:  # enemy piece not applying check
+                        break
         # knight checks
-        knightMoves = [(1, 2), (1, -2), (-1, 2), (-1, -2), (2, -1), (2, 1), (-2, 1), (-2, -1)]
-        for m in knightMoves:
-            endRow = startRow + m[0]
-            endCol = startCol + m[1]
-            if 0 <= endRow <= 7 and 0 <= endCol <= 7:
-                endPiece = self.board[endRow][endCol]
-                if endPiece[0] == enemyColor and endPiece[1] == "N":  # enemy Knight checking King
-                    inCheck = True
-                    checks.append((endRow, endCol, m[0], m[1]))
+        enemyKnight = enemyColor + "N"
+        for endRow, endCol in KNIGHT_SQUARES[startRow * 8 + startCol]:
+            if self.board[endRow][endCol] == enemyKnight:  # enemy Knight checking King
+                inCheck = True
+                checks.append((endRow, endCol, endRow - startRow, endCol - startCol))
         return inCheck, pins, checks
 
 
@@ -515,28 +804,76 @@ class CastleRights():
         self.wqs = wqs
         self.bqs = bqs
 
+    '''
+    restore the rights from a bitmask made by Zobrist.castleIndex
+    '''
+    def setMask(self, mask):
+        self.wks = mask & 1 != 0
+        self.wqs = mask & 2 != 0
+        self.bks = mask & 4 != 0
+        self.bqs = mask & 8 != 0
+
 class Move():
     ranksToRows = {"1": 7, "2": 6, "3": 5, "4": 4, "5": 3, "6": 2, "7": 1, "8": 0}
     rowsToRanks = {v: k for k, v in ranksToRows.items()}
     filesToCols = {"a": 0, "b": 1, "c": 2, "d": 3, "e": 4, "f": 5, "g": 6, "h": 7}
     colsToFiles = {v: k for k, v in filesToCols.items()}
-
-    def __init__(self, startSq, endSq, board, isEnpassantMove=False, isCastleMove=False):
+    promotionCodes = {"Q": 0, "R": 1, "B": 2, "N": 3}  # part of the moveID so every promotion is its own move
+    # generators create thousands of moves a node, slots keep every one a single small object without a __dict__
+    __slots__ = ("startRow", "startCol", "endRow", "endCol", "pieceMoved", "pieceCaptured", "promoteTo",
+                 "isPawnPromotion", "isEnpassantMove", "isCastleMove", "moveID")
+
+    def __init__(self, startSq, endSq, board, isEnpassantMove=False, isCastleMove=False, promoteTo='Q'):
+        pieceMoved = board[startSq[0]][startSq[1]]
+        pieceCaptured = board[endSq[0]][endSq[1]] if not isEnpassantMove else board[startSq[0]][endSq[1]]
+        self.setup(startSq, endSq, pieceMoved, pieceCaptured, isEnpassantMove, isCastleMove, promoteTo)
+
+    '''
+    build a move from the pieces involved instead of reading them from an 8x8 board
+    '''
+    @classmethod
+    def fromPieces(cls, startSq, endSq, pieceMoved, pieceCaptured, isEnpassantMove=False, isCastleMove=False,
+                   promoteTo='Q'):
+        move = cls.__new__(cls)
+        move.setup(startSq, endSq, pieceMoved, pieceCaptured, isEnpassantMove, isCastleMove, promoteTo)
+        return move
+
+    '''
+    fast path for the generators: a move that is not a promotion, en passant or castle
+    no square tuples are built and nothing is read from the board
+    '''
+    @classmethod
+    def fromSquares(cls, startRow, startCol, endRow, endCol, pieceMoved, pieceCaptured):
+        move = cls.__new__(cls)
+        move.startRow = startRow
+        move.startCol = startCol
+        move.endRow = endRow
+        move.endCol = endCol
+        move.pieceMoved = pieceMoved
+        move.pieceCaptured = pieceCaptured
+        move.promoteTo = 'Q'
+        move.isPawnPromotion = False
+        move.isEnpassantMove = False
+        move.isCastleMove = False
+        move.moveID = startRow * 1000 + startCol * 100 + endRow * 10 + endCol
+        return move
+
+    def setup(self, startSq, endSq, pieceMoved, pieceCaptured, isEnpassantMove, isCastleMove, promoteTo='Q'):
         self.startRow = startSq[0]
         self.startCol = startSq[1]
         self.endRow = endSq[0]
         self.endCol = endSq[1]
-        self.pieceMoved = board[self.startRow][self.startCol]
+        self.pieceMoved = pieceMoved
         # promotion
-        self.promoteTo = 'Q'
+        self.promoteTo = promoteTo
         self.isPawnPromotion = (self.pieceMoved == "bp" and self.endRow == 7) or (
                     self.pieceMoved == "wp" and self.endRow == 0)
         # En Passant
-        self.enpassantPossible = ()
         self.isEnpassantMove = isEnpassantMove
-        self.pieceCaptured = board[self.endRow][self.endCol] if not isEnpassantMove else board[self.startRow][
-            self.endCol]
+        self.pieceCaptured = pieceCaptured
         self.moveID = self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol * 1
+        if self.isPawnPromotion:
+            self.moveID += self.promotionCodes[promoteTo] * 10000
         # Castle
         self.isCastleMove = isCastleMove
 
@@ -561,5 +898,15 @@ class Move():
         else:
             return self.pieceMoved[1] + "x" + self.getRankFile(self.endRow, self.endCol)
 
+    '''
+    long algebraic notation like e2e4 or e7e8q, as used by perft tools and engines
+    '''
+
+    def getLongNotation(self):
+        notation = self.getRankFile(self.startRow, self.startCol) + self.getRankFile(self.endRow, self.endCol)
+        if self.isPawnPromotion:
+            notation += self.promoteTo.lower()
+        return notation
+
     def getRankFile(self, r, c):
         return self.colsToFiles[c] + self.rowsToRanks[r]
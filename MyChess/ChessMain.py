@@ -3,9 +3,17 @@
 --> handle input data
 --> display current GameState object
 """
+import os
+import threading
+import time
 import pygame as p
 from MyChess import ChessEngine
 from MyChess import SmartMoves
+from MyChess import Bitboard
+from MyChess import TranspositionTable
+from MyChess import MoveOrdering
+from MyChess import OpeningBook
+from MyChess import Tablebase
 
 WIDTH = HEIGHT = 480  # can use 400
 DIMENSION = 8  # 8x8 board
@@ -13,6 +21,12 @@ SQ_SIZE = HEIGHT // DIMENSION
 MAX_FPS = 15  # for animation
 IMAGES = {}
 COLORS = [p.Color('light gray'), p.Color('dark gray')]
+BITBOARDS = False  # run the engine on the bitboard backend
+TT_SIZE_MB = 16  # memory budget of the AI's transposition table
+AI_TIME_MS = 1000  # thinking time the AI gets for every move
+PONDER = True  # search the expected reply while the human thinks
+BOOK_PATH = "book.bin"  # opening book built with OpeningBook, played from when the file exists
+TABLEBASE_DIR = "tablebases"  # endgame tables built with Tablebase, probed by the search when the directory exists
 '''
 Initialize a global dictionary of images. This will be called exactly once in the main
 '''
@@ -22,6 +36,101 @@ def loadImages():
     pieces = ['wp', 'wR', 'wN', 'wB', 'wQ', 'wK', 'bp', 'bR', 'bN', 'bB', 'bQ', 'bK']
     for piece in pieces:
         IMAGES[piece] = p.transform.scale(p.image.load("images/" + piece + ".png"), (SQ_SIZE, SQ_SIZE))
+
+
+'''
+Create a fresh game on the selected backend
+'''
+
+
+def newGameState():
+    if BITBOARDS:
+        return Bitboard.BitboardGameState()
+    return ChessEngine.GameState()
+
+
+'''
+AI search running on a background thread so the window keeps drawing and handling events
+the search works on its own copy of the position, the result is only used if the game is still there
+a ponder search has no deadline until ponderHit gives it one
+a position found in the book is answered with a book move without searching
+'''
+class AIThinker():
+    def __init__(self, gs, tt, orderer, ponder=False, book=None):
+        self.zobristKey = gs.zobristKey
+        self.ply = len(gs.moveLog)
+        self.searchState = type(gs).from_fen(gs.to_fen())
+        self.cancelToken = threading.Event()
+        self.startTime = time.perf_counter()
+        self.stats = SmartMoves.SearchStats(None if ponder else self.startTime + AI_TIME_MS / 1000, self.cancelToken)
+        self.move = None
+        self.pv = []  # line the search expects, starting with move
+        self.thread = threading.Thread(target=self.think, args=(tt, orderer, book), daemon=True)
+        self.thread.start()
+
+    def think(self, tt, orderer, book):
+        validMoves = self.searchState.getValidMoves()
+        if book is not None:
+            self.move = book.pickMove(self.searchState, validMoves)
+            if self.move is not None:
+                return
+        move, score, depth, stats, pv = SmartMoves.findBestMoveIterative(self.searchState, validMoves, AI_TIME_MS, tt,
+                                                                            orderer=orderer, stats=self.stats)
+        if move is None and len(validMoves) != 0:
+            move = SmartMoves.randomAI(validMoves)
+        self.move = move
+        self.pv = pv
+
+    def done(self):
+        return not self.thread.is_alive()
+
+    '''
+    the opponent played the move this ponder search expected, the search carries on as the real one
+    it keeps the usual AI_TIME_MS in total, so the time already spent pondering is saved
+    returns the seconds saved
+    '''
+    def ponderHit(self):
+        now = time.perf_counter()
+        saved = min(now - self.startTime, AI_TIME_MS / 1000)
+        self.stats.deadline = now + AI_TIME_MS / 1000 - saved
+        return saved
+
+    '''
+    stop the search and wait for the thread, it checks the token at every node so this is quick
+    '''
+    def cancel(self):
+        self.cancelToken.set()
+        self.thread.join()
+
+    '''
+    the move to play in gs, or None if the search was cancelled or gs is no longer the searched position
+    '''
+    def result(self, gs, validMoves):
+        if self.cancelToken.is_set() or self.move is None or gs.zobristKey != self.zobristKey or \
+                len(gs.moveLog) != self.ply:
+            return None
+        for move in validMoves:
+            if move == self.move:
+                return move
+        return None
+
+
+'''
+start a ponder search on the position after the reply the transposition table expects, None if there is none
+'''
+
+
+def startPondering(gs, tt, orderer):
+    expected = tt.bestMove(gs.zobristKey)
+    validMoves = gs.getValidMoves()
+    if expected is None or expected not in validMoves:
+        return None
+    gs.makeMove(validMoves[validMoves.index(expected)])
+    ponderer = AIThinker(gs, tt, orderer, ponder=True)
+    gs.undoMove()
+    return ponderer
+
+
 '''
 main driver for our code. This will handle user input and updating the graphics
 '''
@@ -32,8 +141,13 @@ def main():
     screen = p.display.set_mode((WIDTH, HEIGHT))
     clock = p.time.Clock()
     screen.fill(p.Color("white"))
-    gs = ChessEngine.GameState()
+    gs = newGameState()
     validMoves = gs.getValidMoves()  # store all current valid moves
+    tt = TranspositionTable.TranspositionTable(TT_SIZE_MB)  # kept between moves
+    orderer = MoveOrdering.MoveOrderer(SmartMoves.piecesPoints)  # history scores carry over between moves
+    book = OpeningBook.OpeningBook(BOOK_PATH) if os.path.exists(BOOK_PATH) else None
+    if os.path.isdir(TABLEBASE_DIR):
+        SmartMoves.tablebase = Tablebase.Tablebase(TABLEBASE_DIR)
     moveMade = False  # flag for move made
     loadImages()  # only once
     light = "light gray"
@@ -45,6 +159,11 @@ def main():
     playerTwo = True  # if black is human this is True
     sqSelected = ()  # no square selected initially (row, col)
     playerClicks = []  # [(xi, yi), (xf, yf)]
+    aiThinker = None  # AIThinker while the AI searches
+    ponderer = None  # AIThinker searching the position after the expected human reply
+    ponderHits = 0
+    ponderMisses = 0
+    ponderTimeSaved = 0.0  # seconds
     while running:
         humanTurn = (gs.whiteToMove and playerOne) or (not gs.whiteToMove and playerTwo)
         for e in p.event.get():
@@ -70,6 +189,7 @@ def main():
                             if move == validMoves[i]:
                                 if validMoves[i].isPawnPromotion:
                                     print("Enter choice\nRook : R\nBishop : B\nKnight : N\nQueen : Any else key")
+                                    promoteTo = 'Q'
                                     pieceInput = True
                                     while pieceInput:
                                         promoteEvent = p.event.wait()
@@ -79,16 +199,19 @@ def main():
                                             pieceInput = False
                                             if promoteEvent.key == p.K_r:
                                                 print("you chose Rook")
-                                                validMoves[i].promoteTo = 'R'
+                                                promoteTo = 'R'
                                             elif promoteEvent.key == p.K_b:
                                                 print("you chose Bishop")
-                                                validMoves[i].promoteTo = 'B'
+                                                promoteTo = 'B'
                                             elif promoteEvent.key == p.K_n:
                                                 print("you chose Knight")
-                                                validMoves[i].promoteTo = 'N'
+                                                promoteTo = 'N'
                                             else:
                                                 print("you chose Queen")
-                                                validMoves[i].promoteTo = 'Q'
+                                                promoteTo = 'Q'
+                                    # every promotion piece is a valid move of its own
+                                    i = validMoves.index(ChessEngine.Move(playerClicks[0], playerClicks[1], gs.board,
+                                                                          promoteTo=promoteTo))
                                 else:
                                     pass
                                 gs.makeMove(validMoves[i])
@@ -96,9 +219,16 @@ def main():
                                 animate = True
                                 sqSelected = ()  # reset user clicks
                                 playerClicks = []
+                                break
                         if not moveMade:
                             playerClicks = [sqSelected]
             elif e.type == p.KEYDOWN:
+                if (e.key == p.K_z or e.key == p.K_r) and aiThinker is not None:  # abort the search
+                    aiThinker.cancel()
+                    aiThinker = None
+                if (e.key == p.K_z or e.key == p.K_r) and ponderer is not None:
+                    ponderer.cancel()
+                    ponderer = None
                 if e.key == p.K_z:
                     if not gameOver:
                         gs.undoMove()
@@ -119,8 +249,10 @@ def main():
                     light = "pink"
                     dark = "brown"
                 elif e.key == p.K_r:  # reset board
-                    gs = ChessEngine.GameState()
+                    gs = newGameState()
                     validMoves = gs.getValidMoves()
+                    tt.clear()
+                    orderer = MoveOrdering.MoveOrderer(SmartMoves.piecesPoints)
                     sqSelected = ()
                     playerClicks = []
                     playerOne = False  # if white is human this is True
@@ -128,14 +260,33 @@ def main():
                     moveMade = False
                     animate = False
                     gameOver = False
-        if not humanTurn and not gameOver:
-            move = SmartMoves.findBestMoveMinMax(gs, validMoves)
-            # move = None
-            if move is None:
-                move = SmartMoves.randomAI(validMoves)
-            gs.makeMove(move)
-            moveMade = True
-            animate = True
+        if not humanTurn and not gameOver and not moveMade:
+            if aiThinker is None and ponderer is not None:
+                if ponderer.zobristKey == gs.zobristKey and ponderer.ply == len(gs.moveLog):
+                    aiThinker = ponderer  # ponder hit, keep searching with a head start
+                    ponderHits += 1
+                    ponderTimeSaved += aiThinker.ponderHit()
+                else:
+                    ponderer.cancel()
+                    ponderMisses += 1
+                ponderer = None
+                print("ponder hit rate " + format(ponderHits / (ponderHits + ponderMisses), ".2f") +
+                      ", saved " + format(1000 * ponderTimeSaved / (ponderHits + ponderMisses), ".0f") + "ms a move")
+            if aiThinker is None:
+                aiThinker = AIThinker(gs, tt, orderer, book=book)
+            elif aiThinker.done():
+                move = aiThinker.result(gs, validMoves)
+                pv = aiThinker.pv
+                aiThinker = None
+                if move is not None:  # otherwise the position changed, search again next frame
+                    if len(pv) != 0:
+                        print("pv " + " ".join(pvMove.getLongNotation() for pvMove in pv))
+                    gs.makeMove(move)
+                    moveMade = True
+                    animate = True
+                    humanNext = (gs.whiteToMove and playerOne) or (not gs.whiteToMove and playerTwo)
+                    if PONDER and humanNext:
+                        ponderer = startPondering(gs, tt, orderer)
         if moveMade:
             if animate:
                 animateMove(screen, gs.moveLog[-1], gs.board, clock)
@@ -146,11 +297,19 @@ def main():
             elif len(validMoves) == 0 and not gs.inCheck:
                 gs.staleMate = True
                 gameOver = True
+            # the human replied with another move or ended the game, the ponder search would run on for nothing
+            if ponderer is not None and (gameOver or len(gs.moveLog) >= ponderer.ply and
+                                         (ponderer.zobristKey != gs.zobristKey or len(gs.moveLog) != ponderer.ply)):
+                ponderer.cancel()
+                ponderer = None
+                ponderMisses += 1
             print("white to move" if gs.whiteToMove else "black to move")
             moveMade = False
             animate = False
 
         drawGameSate(screen, gs, validMoves, sqSelected, light, dark)
+        if aiThinker is not None:
+            drawThinking(screen)
 
         if gs.checkMate:
             gameOver = True
@@ -292,5 +451,17 @@ def drawText(screen, text):
     screen.blit(textObject, textLocation.move(-2, -2))
 
 
+'''
+small indicator in the corner while the AI is searching
+'''
+
+
+def drawThinking(screen):
+    font = p.font.SysFont("Open Sans", 20, True, False)
+    textObject = font.render("thinking...", 0, p.Color('Black'))
+    screen.blit(textObject, p.Rect(4, HEIGHT - textObject.get_height() - 4, textObject.get_width(),
+                                   textObject.get_height()))
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,176 @@
+"""
+--> material and piece-square table evaluation in centipawns, positive favours white
+--> separate middlegame and endgame tables blended by game phase
+--> GameState keeps the middlegame score, endgame score and phase up to date on every move,
+    so evaluating a position costs O(1)
+"""
+
+# same proportions as SmartMoves.piecesPoints, in centipawns
+PIECE_VALUES = {"p": 100, "N": 300, "B": 300, "R": 500, "Q": 800, "K": 0}
+# phase counts down from MAX_PHASE with all pieces on the board towards 0 in a pawn ending
+PHASE_WEIGHTS = {"p": 0, "N": 1, "B": 1, "R": 2, "Q": 4, "K": 0}
+MAX_PHASE = 24
+
+# tables are written from white's side, first row is the 8th rank like GameState.board
+PAWN_MG = [0, 0, 0, 0, 0, 0, 0, 0,
+           50, 50, 50, 50, 50, 50, 50, 50,
+           10, 10, 20, 30, 30, 20, 10, 10,
+           5, 5, 10, 25, 25, 10, 5, 5,
+           0, 0, 0, 20, 20, 0, 0, 0,
+           5, -5, -10, 0, 0, -10, -5, 5,
+           5, 10, 10, -20, -20, 10, 10, 5,
+           0, 0, 0, 0, 0, 0, 0, 0]
+PAWN_EG = [0, 0, 0, 0, 0, 0, 0, 0,
+           80, 80, 80, 80, 80, 80, 80, 80,
+           50, 50, 50, 50, 50, 50, 50, 50,
+           30, 30, 30, 30, 30, 30, 30, 30,
+           20, 20, 20, 20, 20, 20, 20, 20,
+           10, 10, 10, 10, 10, 10, 10, 10,
+           0, 0, 0, 0, 0, 0, 0, 0,
+           0, 0, 0, 0, 0, 0, 0, 0]
+KNIGHT = [-50, -40, -30, -30, -30, -30, -40, -50,
+          -40, -20, 0, 0, 0, 0, -20, -40,
+          -30, 0, 10, 15, 15, 10, 0, -30,
+          -30, 5, 15, 20, 20, 15, 5, -30,
+          -30, 0, 15, 20, 20, 15, 0, -30,
+          -30, 5, 10, 15, 15, 10, 5, -30,
+          -40, -20, 0, 5, 5, 0, -20, -40,
+          -50, -40, -30, -30, -30, -30, -40, -50]
+BISHOP = [-20, -10, -10, -10, -10, -10, -10, -20,
+          -10, 0, 0, 0, 0, 0, 0, -10,
+          -10, 0, 5, 10, 10, 5, 0, -10,
+          -10, 5, 5, 10, 10, 5, 5, -10,
+          -10, 0, 10, 10, 10, 10, 0, -10,
+          -10, 10, 10, 10, 10, 10, 10, -10,
+          -10, 5, 0, 0, 0, 0, 5, -10,
+          -20, -10, -10, -10, -10, -10, -10, -20]
+ROOK = [0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0]
+QUEEN = [-20, -10, -10, -5, -5, -10, -10, -20,
+         -10, 0, 0, 0, 0, 0, 0, -10,
+         -10, 0, 5, 5, 5, 5, 0, -10,
+         -5, 0, 5, 5, 5, 5, 0, -5,
+         0, 0, 5, 5, 5, 5, 0, -5,
+         -10, 5, 5, 5, 5, 5, 0, -10,
+         -10, 0, 5, 0, 0, 0, 0, -10,
+         -20, -10, -10, -5, -5, -10, -10, -20]
+KING_MG = [-30, -40, -40, -50, -50, -40, -40, -30,
+           -30, -40, -40, -50, -50, -40, -40, -30,
+           -30, -40, -40, -50, -50, -40, -40, -30,
+           -30, -40, -40, -50, -50, -40, -40, -30,
+           -20, -30, -30, -40, -40, -30, -30, -20,
+           -10, -20, -20, -20, -20, -20, -20, -10,
+           20, 20, 0, 0, 0, 0, 20, 20,
+           20, 30, 10, 0, 0, 10, 30, 20]
+KING_EG = [-50, -40, -30, -20, -20, -30, -40, -50,
+           -30, -20, -10, 0, 0, -10, -20, -30,
+           -30, -10, 20, 30, 30, 20, -10, -30,
+           -30, -10, 30, 40, 40, 30, -10, -30,
+           -30, -10, 30, 40, 40, 30, -10, -30,
+           -30, -10, 20, 30, 30, 20, -10, -30,
+           -30, -30, 0, 0, 0, 0, -30, -30,
+           -50, -30, -30, -30, -30, -30, -30, -50]
+# minor and major pieces use the same table in both phases
+TABLES = {"p": (PAWN_MG, PAWN_EG), "N": (KNIGHT, KNIGHT), "B": (BISHOP, BISHOP), "R": (ROOK, ROOK),
+          "Q": (QUEEN, QUEEN), "K": (KING_MG, KING_EG)}
+
+'''
+signed value of every piece on every square, material included
+black squares are mirrored vertically and negated
+'''
+
+
+def buildTable(phaseIndex):
+    table = {}
+    for piece, tables in TABLES.items():
+        pst = tables[phaseIndex]
+        table["w" + piece] = [PIECE_VALUES[piece] + pst[sq] for sq in range(64)]
+        table["b" + piece] = [-(PIECE_VALUES[piece] + pst[(7 - sq // 8) * 8 + sq % 8]) for sq in range(64)]
+    return table
+
+
+MIDDLEGAME = buildTable(0)
+ENDGAME = buildTable(1)
+PHASE = {color + piece: PHASE_WEIGHTS[piece] for color in "wb" for piece in PHASE_WEIGHTS}
+
+'''
+middlegame score, endgame score and phase of a board computed from scratch
+'''
+
+
+def computeScores(board):
+    mg = eg = phase = 0
+    for r in range(8):
+        for c in range(8):
+            piece = board[r][c]
+            if piece != "--":
+                mg += MIDDLEGAME[piece][r * 8 + c]
+                eg += ENDGAME[piece][r * 8 + c]
+                phase += PHASE[piece]
+    return mg, eg, phase
+
+
+'''
+change of the middlegame score, endgame score and phase made by a move
+makeMove adds it, undoMove restores the scores saved on the undo stack
+'''
+
+
+def moveDelta(move):
+    start = move.startRow * 8 + move.startCol
+    end = move.endRow * 8 + move.endCol
+    piece = move.pieceMoved
+    placed = piece[0] + move.promoteTo if move.isPawnPromotion else piece
+    mg = MIDDLEGAME[placed][end] - MIDDLEGAME[piece][start]
+    eg = ENDGAME[placed][end] - ENDGAME[piece][start]
+    phase = PHASE[placed] - PHASE[piece]
+    if move.pieceCaptured != "--":
+        captured = move.pieceCaptured
+        sq = move.startRow * 8 + move.endCol if move.isEnpassantMove else end
+        mg -= MIDDLEGAME[captured][sq]
+        eg -= ENDGAME[captured][sq]
+        phase -= PHASE[captured]
+    if move.isCastleMove:
+        rook = piece[0] + "R"
+        if move.endCol - move.startCol == 2:  # king side castle
+            rookStart, rookEnd = end + 1, end - 1
+        else:  # queen side castle
+            rookStart, rookEnd = end - 2, end + 1
+        mg += MIDDLEGAME[rook][rookEnd] - MIDDLEGAME[rook][rookStart]
+        eg += ENDGAME[rook][rookEnd] - ENDGAME[rook][rookStart]
+    return mg, eg, phase
+
+
+'''
+blend middlegame and endgame scores by phase
+'''
+
+
+def blend(mg, eg, phase):
+    if phase > MAX_PHASE:  # possible after promotions
+        phase = MAX_PHASE
+    return (mg * phase + eg * (MAX_PHASE - phase)) // MAX_PHASE
+
+
+'''
+score of the position from white's point of view using the incrementally kept scores
+'''
+
+
+def evaluate(gs):
+    return blend(gs.mgScore, gs.egScore, gs.phase)
+
+
+'''
+same score computed from the board, for validating the incremental one
+'''
+
+
+def evaluateFromScratch(gs):
+    return blend(*computeScores(gs.board))
@@ -0,0 +1,182 @@
+"""
+--> order moves before searching them so alpha-beta cuts off early
+--> transposition table move, then captures by MVV-LVA, then killer moves, then history scores,
+    captures that lose material by static exchange evaluation go last
+--> counts how often the first move searched was good enough for a beta cutoff
+--> staged generation that produces moves in that order one stage at a time, stages after a cutoff are never generated
+"""
+
+MAX_PLY = 64
+TT_MOVE_SCORE = 1000000
+CAPTURE_SCORE = 100000  # plus 10 * victim value - attacker value
+LOSING_CAPTURE_SCORE = -100000  # plus the static exchange score, below every quiet move
+KILLER_SCORES = [90000, 80000]  # first and second killer of a ply
+HISTORY_LIMIT = 50000  # history scores are halved once one reaches this, so they stay below the killers
+HASH_STAGE, WINNING_CAPTURE_STAGE, KILLER_STAGE, QUIET_STAGE, LOSING_CAPTURE_STAGE = range(5)
+STAGE_NAMES = ("hash move", "winning captures", "killers", "quiet moves", "losing captures")
+
+
+class MoveOrderer():
+    def __init__(self, piecesPoints, maxPly=MAX_PLY):
+        self.piecesPoints = piecesPoints
+        self.maxPly = maxPly
+        self.killers = [[0, 0] for _ in range(maxPly)]  # moveIDs of quiet moves that caused cutoffs at each ply
+        self.history = {color + piece: [0] * 64 for color in "wb" for piece in "pNBRQK"}
+        self.cutoffs = 0
+        self.firstMoveCutoffs = 0
+        self.skippedStages = [0] * len(STAGE_NAMES)  # times each stage was never generated thanks to a cutoff
+
+    '''
+    sort moves in place, best candidates first, and return them
+    ttMove is the best move stored in the transposition table for this position, if any
+    gs is the position of the moves, when given captures losing material by static exchange are put last
+    '''
+    def orderMoves(self, moves, ply, ttMove=None, gs=None):
+        ttMoveID = ttMove.moveID if ttMove is not None else -1
+        killers = self.killers[ply] if ply < self.maxPly else [0, 0]
+        history = self.history
+
+        def score(move):
+            if move.moveID == ttMoveID:
+                return TT_MOVE_SCORE
+            if move.pieceCaptured != "--" or move.isPawnPromotion:
+                if gs is not None:
+                    exchange = self.exchangeScore(gs, move)
+                    if exchange < 0:
+                        return LOSING_CAPTURE_SCORE + exchange
+                return self.captureScore(move)
+            if move.moveID == killers[0]:
+                return KILLER_SCORES[0]
+            if move.moveID == killers[1]:
+                return KILLER_SCORES[1]
+            return history[move.pieceMoved][move.endRow * 8 + move.endCol]
+
+        moves.sort(key=score, reverse=True)
+        return moves
+
+    '''
+    MVV-LVA score of a capture or promotion, the most valuable victim first and the least valuable attacker first
+    '''
+    def captureScore(self, move):
+        victim = self.piecesPoints[move.pieceCaptured[1]] if move.pieceCaptured != "--" else 0
+        if move.isPawnPromotion:
+            victim += self.piecesPoints[move.promoteTo]
+        return CAPTURE_SCORE + 10 * victim - self.piecesPoints[move.pieceMoved[1]]
+
+    '''
+    static exchange score of a capture, 0 without working it out when the victim is worth at least the attacker,
+    since the capturing side can then always stop with nothing lost
+    '''
+    def exchangeScore(self, gs, move):
+        if move.pieceCaptured != "--" and \
+                self.piecesPoints[move.pieceCaptured[1]] >= self.piecesPoints[move.pieceMoved[1]]:
+            return 0
+        return gs.staticExchange(move, self.piecesPoints)
+
+    '''
+    legal moves of gs, generated a stage at a time as the search asks for them: the hash move, captures that do not
+    lose material by static exchange in MVV-LVA order, killers, quiet moves by history score, then the losing
+    captures, the least bad first
+    the hash move and killers are checked against the moves of their piece only, so a cutoff on one of them
+    costs no full generation; close() the generator when done with it so the stages it skipped are counted
+    gs.inCheck holds for the position once the generator is exhausted
+    '''
+    def stagedMoves(self, gs, ply, ttMove=None):
+        stage = HASH_STAGE
+        try:
+            done = set()  # moveIDs already produced
+            if ttMove is not None:
+                move = self.findMove(gs, ttMove.startRow, ttMove.startCol, ttMove.moveID)
+                if move is not None:
+                    done.add(move.moveID)
+                    yield move
+            stage = WINNING_CAPTURE_STAGE
+            winning = []
+            losing = []  # (static exchange score, move)
+            for move in gs.getCaptureMoves():
+                if move.moveID not in done:
+                    exchange = self.exchangeScore(gs, move)
+                    if exchange >= 0:
+                        winning.append(move)
+                    else:
+                        losing.append((exchange, move))
+            winning.sort(key=self.captureScore, reverse=True)
+            for move in winning:
+                done.add(move.moveID)
+                yield move
+            stage = KILLER_STAGE
+            for killer in (self.killers[ply] if ply < self.maxPly else ()):
+                if killer != 0 and killer not in done:  # killers are quiet, so the moveID has no promotion part
+                    endRow, endCol = killer // 10 % 10, killer % 10
+                    if gs.pieceAt(endRow, endCol) == "--":
+                        move = self.findMove(gs, killer // 1000, killer // 100 % 10, killer)
+                        if move is not None and not move.isEnpassantMove:
+                            done.add(move.moveID)
+                            yield move
+            stage = QUIET_STAGE
+            history = self.history
+            quiets = [move for move in gs.getQuietMoves() if move.moveID not in done]
+            quiets.sort(key=lambda move: history[move.pieceMoved][move.endRow * 8 + move.endCol], reverse=True)
+            yield from quiets
+            stage = LOSING_CAPTURE_STAGE
+            losing.sort(key=lambda entry: entry[0], reverse=True)
+            for _, move in losing:
+                yield move
+            stage = len(STAGE_NAMES)
+        finally:
+            for skipped in range(stage + 1, len(STAGE_NAMES)):
+                self.skippedStages[skipped] += 1
+
+    '''
+    the legal move with moveID of the piece on (r, c) for the side to move, None when there is none
+    '''
+    def findMove(self, gs, r, c, moveID):
+        piece = gs.pieceAt(r, c)
+        if piece == "--" or (piece[0] == "w") != gs.whiteToMove:
+            return None
+        for move in gs.getPieceMoves(r, c):
+            if move.moveID == moveID:
+                return move
+        return None
+
+    '''
+    called when the move at moveIndex caused a beta cutoff at ply with depth left
+    '''
+    def recordCutoff(self, move, ply, depth, moveIndex):
+        self.cutoffs += 1
+        if moveIndex == 0:
+            self.firstMoveCutoffs += 1
+        if move.pieceCaptured != "--" or move.isPawnPromotion:  # captures are already ordered by MVV-LVA
+            return
+        if ply < self.maxPly:
+            killers = self.killers[ply]
+            if killers[0] != move.moveID:
+                killers[1] = killers[0]
+                killers[0] = move.moveID
+        table = self.history[move.pieceMoved]
+        sq = move.endRow * 8 + move.endCol
+        table[sq] += depth * depth
+        if table[sq] >= HISTORY_LIMIT:
+            for scores in self.history.values():
+                for i in range(64):
+                    scores[i] //= 2
+
+    '''
+    forget killers before a new search, history is kept but aged
+    '''
+    def newSearch(self):
+        self.killers = [[0, 0] for _ in range(self.maxPly)]
+        for scores in self.history.values():
+            for i in range(64):
+                scores[i] //= 2
+        self.cutoffs = 0
+        self.firstMoveCutoffs = 0
+        self.skippedStages = [0] * len(STAGE_NAMES)
+
+    '''
+    ordering statistics, firstMoveCutoffRate close to 1 means the ordering works
+    '''
+    def stats(self):
+        return {"cutoffs": self.cutoffs, "firstMoveCutoffs": self.firstMoveCutoffs,
+                "firstMoveCutoffRate": self.firstMoveCutoffs / self.cutoffs if self.cutoffs else 0.0,
+                "skippedStages": dict(zip(STAGE_NAMES, self.skippedStages))}
@@ -0,0 +1,52 @@
+"""
+--> lookup tables for the 8x8 board generators, built once at import
+--> rays of (row, col) squares per square and direction, knight and king targets per square
+--> between masks for aligned squares
+squares are numbered row * 8 + col like Bitboard, so square 0 is a8 and square 63 is h1
+"""
+
+# first four directions are rook directions, last four are bishop directions
+DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+ROOK_DIRECTIONS = range(0, 4)
+BISHOP_DIRECTIONS = range(4, 8)
+OPPOSITE = tuple((-dr, -dc) for dr, dc in DIRECTIONS)  # OPPOSITE[d] is the reverse of DIRECTIONS[d]
+KNIGHT_JUMPS = ((1, 2), (1, -2), (-1, 2), (-1, -2), (2, -1), (2, 1), (-2, 1), (-2, -1))
+
+'''
+(row, col) of every square reached from sq by the given offsets
+'''
+
+
+def targets(sq, offsets):
+    r, c = divmod(sq, 8)
+    return tuple((r + dr, c + dc) for dr, dc in offsets if 0 <= r + dr <= 7 and 0 <= c + dc <= 7)
+
+
+'''
+(row, col) of every square from sq (exclusive) to the edge of the board in direction (dr, dc)
+'''
+
+
+def ray(sq, dr, dc):
+    r, c = divmod(sq, 8)
+    squares = []
+    for i in range(1, 8):
+        row = r + dr * i
+        col = c + dc * i
+        if not (0 <= row <= 7 and 0 <= col <= 7):
+            break
+        squares.append((row, col))
+    return tuple(squares)
+
+
+KNIGHT_SQUARES = [targets(sq, KNIGHT_JUMPS) for sq in range(64)]
+KING_SQUARES = [targets(sq, DIRECTIONS) for sq in range(64)]
+RAYS = [[ray(sq, dr, dc) for dr, dc in DIRECTIONS] for sq in range(64)]  # RAYS[square][direction]
+
+BETWEEN = [[0] * 64 for _ in range(64)]  # bitmask of the squares strictly between two aligned squares
+for sq in range(64):
+    for squares in RAYS[sq]:
+        mask = 0
+        for row, col in squares:
+            BETWEEN[sq][row * 8 + col] = mask
+            mask |= 1 << (row * 8 + col)
@@ -0,0 +1,181 @@
+"""
+--> opening book keyed by the GameState zobrist key
+--> sorted binary file read through mmap with a binary search, so opening a book costs the same at any size
+--> weighted random choice between the book moves of a position
+--> builder that compiles a book from the games of PGN files
+run from the repository root:
+    python -m MyChess.OpeningBook build games.pgn more.pgn -o book.bin --max-ply 20
+    python -m MyChess.OpeningBook probe book.bin --fen "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1"
+"""
+import argparse
+import mmap
+import random
+import re
+import struct
+from MyChess import ChessEngine
+
+# every entry is the zobrist key, the moveID, the weight and 4 spare bytes, entries are sorted by key
+ENTRY = struct.Struct(">QHHI")
+MAX_WEIGHT = 0xFFFF
+MAX_PLY = 20  # the builder only records this many plies of every game
+RESULT_POINTS = {"1-0": (2, 0), "0-1": (0, 2), "1/2-1/2": (1, 1), "*": (1, 1)}  # white, black weight per move
+
+
+class OpeningBook():
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.size = 0
+        self.data = None
+        if self.file.seek(0, 2) >= ENTRY.size:  # mmap refuses empty files
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.size = len(self.data) // ENTRY.size
+
+    '''
+    (moveID, weight) of every book move stored for key
+    '''
+    def entries(self, key):
+        low, high = 0, self.size
+        while low < high:  # first entry with a key not below key
+            mid = (low + high) // 2
+            if ENTRY.unpack_from(self.data, mid * ENTRY.size)[0] < key:
+                low = mid + 1
+            else:
+                high = mid
+        found = []
+        while low < self.size:
+            entryKey, moveID, weight, _ = ENTRY.unpack_from(self.data, low * ENTRY.size)
+            if entryKey != key:
+                break
+            found.append((moveID, weight))
+            low += 1
+        return found
+
+    '''
+    a book move for gs picked at random in proportion to its weight, None when the position is not in the book
+    '''
+    def pickMove(self, gs, validMoves, rng=random):
+        byID = {move.moveID: move for move in validMoves}
+        candidates = [(byID[moveID], weight) for moveID, weight in self.entries(gs.zobristKey)
+                      if moveID in byID and weight > 0]  # skip entries of a colliding key
+        if len(candidates) == 0:
+            return None
+        pick = rng.randrange(sum(weight for _, weight in candidates))
+        for move, weight in candidates:
+            if pick < weight:
+                return move
+            pick -= weight
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+        self.file.close()
+
+
+'''
+the move in validMoves written as san (standard algebraic notation, like Nbd7, exd5, O-O or e8=Q+), or None
+'''
+
+
+def parseSan(san, validMoves):
+    san = san.rstrip("+#!?")
+    if san in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        for move in validMoves:
+            if move.isCastleMove and (move.endCol == 6) == (len(san) == 3):
+                return move
+        return None
+    match = re.fullmatch(r"([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?", san)
+    if match is None:
+        return None
+    piece, fromFile, fromRank, target, promoteTo = match.groups()
+    endRow = ChessEngine.Move.ranksToRows[target[1]]
+    endCol = ChessEngine.Move.filesToCols[target[0]]
+    for move in validMoves:
+        if move.endRow != endRow or move.endCol != endCol or move.pieceMoved[1] != (piece or "p"):
+            continue
+        if fromFile is not None and move.startCol != ChessEngine.Move.filesToCols[fromFile]:
+            continue
+        if fromRank is not None and move.startRow != ChessEngine.Move.ranksToRows[fromRank]:
+            continue
+        if move.isPawnPromotion and move.promoteTo != (promoteTo or "Q"):
+            continue
+        return move
+    return None
+
+
+'''
+(result, list of san moves) for every game in a PGN text
+'''
+
+
+def readGames(text):
+    text = re.sub(r"^\s*[\[%].*$", " ", text, flags=re.MULTILINE)  # tag pairs and escaped lines
+    text = re.sub(r"\{[^}]*\}|;[^\n]*", " ", text)  # comments
+    while re.search(r"\([^()]*\)", text):  # variations, innermost first
+        text = re.sub(r"\([^()]*\)", " ", text)
+    games = []
+    sans = []
+    for token in text.split():
+        token = re.sub(r"^\d+\.+", "", token)  # move numbers, also when glued to the move
+        if token in RESULT_POINTS:  # a result ends the game
+            games.append((token, sans))
+            sans = []
+        elif token != "" and not token.startswith("$"):
+            sans.append(token)
+    if len(sans) != 0:
+        games.append(("*", sans))
+    return games
+
+
+'''
+compile the games of pgnPaths into a book file at outPath, returns the number of entries written
+a move is weighted by the points its side scored with it, 2 a win, 1 a draw or an unknown result
+'''
+
+
+def buildBook(pgnPaths, outPath, maxPly=MAX_PLY):
+    weights = {}
+    for path in pgnPaths:
+        with open(path, encoding="utf-8", errors="replace") as pgn:
+            games = readGames(pgn.read())
+        for result, sans in games:
+            gs = ChessEngine.GameState()
+            for san in sans[:maxPly]:
+                move = parseSan(san, gs.getValidMoves())
+                if move is None:  # illegal or unreadable, keep what came before
+                    break
+                points = RESULT_POINTS[result][0 if gs.whiteToMove else 1]
+                key = (gs.zobristKey, move.moveID)
+                weights[key] = weights.get(key, 0) + points
+                gs.makeMove(move)
+    entries = sorted((key, moveID, min(weight, MAX_WEIGHT)) for (key, moveID), weight in weights.items() if weight > 0)
+    with open(outPath, "wb") as book:
+        for key, moveID, weight in entries:
+            book.write(ENTRY.pack(key, moveID, weight, 0))
+    return len(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="opening book builder and probe")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="compile PGN files into a book")
+    build.add_argument("pgn", nargs="+")
+    build.add_argument("-o", "--output", default="book.bin")
+    build.add_argument("--max-ply", type=int, default=MAX_PLY)
+    probe = commands.add_parser("probe", help="list the book moves of a position")
+    probe.add_argument("book")
+    probe.add_argument("--fen", default=None)
+    args = parser.parse_args()
+    if args.command == "build":
+        print(str(buildBook(args.pgn, args.output, args.max_ply)) + " entries written to " + args.output)
+    else:
+        gs = ChessEngine.GameState.from_fen(args.fen) if args.fen else ChessEngine.GameState()
+        book = OpeningBook(args.book)
+        byID = {move.moveID: move for move in gs.getValidMoves()}
+        for moveID, weight in book.entries(gs.zobristKey):
+            if moveID in byID:
+                print(byID[moveID].getLongNotation() + " " + str(weight))
+        book.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+--> split the root moves of a search across a pool of worker processes
+--> workers rebuild the position from its FEN, so only a short string and a few moveIDs are pickled
+--> benchmark the parallel search against the single core NegaMax search
+run from the repository root:
+    python -m MyChess.ParallelSearch --depth 4 --workers 1 2 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from MyChess import ChessEngine
+from MyChess import Bitboard
+from MyChess import SmartMoves
+from MyChess import MoveOrdering
+from MyChess import TranspositionTable
+
+WORKER_TT_SIZE_MB = 4  # every worker has a table of its own, nothing is shared
+BENCHMARK_FEN = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+
+'''
+runs inside a worker process: search the root moves with the given moveIDs to depth
+returns (moveID of the best of them, its score for the side to move, nodes searched, process id)
+'''
+
+
+def searchRootMoves(gameStateClass, fen, moveIDs, depth):
+    gs = gameStateClass.from_fen(fen)
+    moves = [move for move in gs.getValidMoves() if move.moveID in moveIDs]
+    stats = SmartMoves.SearchStats()
+    tt = TranspositionTable.TranspositionTable(WORKER_TT_SIZE_MB)
+    orderer = MoveOrdering.MoveOrderer(SmartMoves.piecesPoints)
+    bestMove = moves[0]  # kept when every move is mated
+    bestScore = -SmartMoves.CHECKMATE
+    for d in range(1, depth + 1):  # iterative deepening fills the worker's table and orderer before the last depth
+        move, score = SmartMoves.searchRoot(gs, orderer.orderMoves(moves, 0, bestMove), d, stats, tt, orderer)
+        if move is not None:
+            bestMove, bestScore = move, score
+    return bestMove.moveID, bestScore, stats.nodes, os.getpid()
+
+
+'''
+search validMoves of gs to depth on workers processes, every worker gets every workers-th root move
+executor is an optional ProcessPoolExecutor kept between searches, otherwise one is started for this call
+returns the best move, its score in centipawns from white's point of view and the nodes searched by each worker
+'''
+
+
+def findBestMoveParallel(gs, validMoves, depth=SmartMoves.DEPTH, workers=None, executor=None):
+    if len(validMoves) == 0:
+        return None, 0, []
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(validMoves))
+    # spread the likely best moves over the workers instead of giving them all to the first one
+    ordered = MoveOrdering.MoveOrderer(SmartMoves.piecesPoints).orderMoves(list(validMoves), 0)
+    chunks = [[move.moveID for move in ordered[i::workers]] for i in range(workers)]
+    fen = gs.to_fen()
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(searchRootMoves, [type(gs)] * workers, [fen] * workers, chunks,
+                                    [depth] * workers))
+    else:
+        results = list(executor.map(searchRootMoves, [type(gs)] * workers, [fen] * workers, chunks,
+                                    [depth] * workers))
+    bestMoveID, bestScore = None, -SmartMoves.CHECKMATE - 1
+    for moveID, score, nodes, pid in results:
+        if score > bestScore:
+            bestMoveID, bestScore = moveID, score
+    # the first move is still better than no move if no worker's moveID is legal here
+    bestMove = next((move for move in validMoves if move.moveID == bestMoveID), validMoves[0])
+    return bestMove, (1 if gs.whiteToMove else -1) * bestScore, [nodes for _, _, nodes, _ in results]
+
+
+'''
+time the single core search and the parallel search with every worker count on one position
+'''
+
+
+def runBenchmark(fen, depth, workerCounts, bitboards=False):
+    gameStateClass = Bitboard.BitboardGameState if bitboards else ChessEngine.GameState
+    gs = gameStateClass.from_fen(fen)
+    start = time.perf_counter()
+    move, score, nodes = SmartMoves.findBestMoveNegaMax(gs, gs.getValidMoves(), depth,
+                                                        TranspositionTable.TranspositionTable(),
+                                                        MoveOrdering.MoveOrderer(SmartMoves.piecesPoints))
+    single = time.perf_counter() - start
+    print("single core: " + move.getLongNotation() + " score " + str(score) + " nodes " + str(nodes) + " time " +
+          format(single, ".3f") + "s")
+    for workers in workerCounts:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pool.submit(os.getpid).result()  # start the pool before the clock
+            start = time.perf_counter()
+            move, score, workerNodes = findBestMoveParallel(gs, gs.getValidMoves(), depth, workers, pool)
+            elapsed = time.perf_counter() - start
+        print(str(workers) + " workers: " + move.getLongNotation() + " score " + str(score) + " nodes " +
+              str(sum(workerNodes)) + " " + str(workerNodes) + " time " + format(elapsed, ".3f") + "s speedup " +
+              format(single / elapsed, ".2f"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="parallel root search benchmark")
+    parser.add_argument("--fen", default=BENCHMARK_FEN)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--bitboards", action="store_true", help="use the bitboard backend")
+    args = parser.parse_args()
+    runBenchmark(args.fen, args.depth, args.workers, args.bitboards)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+--> perft: count the leaf nodes of the legal move tree to a given depth
+--> divide breakdown per root move and nodes per second
+--> reference positions with known counts to check GameState.getValidMoves
+--> verify mode checks the incrementally kept key, score and piece lists against a recompute at every node
+run from the repository root:
+    python -m MyChess.Perft --depth 4 --divide
+    python -m MyChess.Perft --fen "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1" --depth 5
+    python -m MyChess.Perft --suite --bitboards
+    python -m MyChess.Perft --suite --verify --max-nodes 10000
+"""
+import argparse
+import time
+from MyChess import ChessEngine
+from MyChess import Bitboard
+from MyChess import Evaluation
+from MyChess import Zobrist
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+# name, fen and the expected number of leaves at depth 1, 2, 3...
+POSITIONS = [
+    ("start", START_FEN, [20, 400, 8902, 197281, 4865609]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603]),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624]),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467, 422333]),
+    ("position 4 mirrored", "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1",
+     [6, 264, 9467, 422333]),
+    ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487]),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594]),
+]
+SUITE_MAX_NODES = 200000  # the suite skips depths with more expected leaves than this
+
+'''
+number of leaf nodes depth plies below the current position
+'''
+
+
+def perft(gs, depth):
+    if depth == 0:
+        return 1
+    moves = gs.getValidMoves()
+    if depth == 1:
+        return len(moves)  # bulk counting, the last ply is never made
+    nodes = 0
+    for move in moves:
+        gs.makeMove(move)
+        nodes += perft(gs, depth - 1)
+        gs.undoMove()
+    return nodes
+
+
+'''
+raise AssertionError when the zobrist key, the evaluation or the piece lists kept up to date by makeMove and undoMove
+differ from the ones computed from the board
+'''
+
+
+def verifyIncremental(gs, context):
+    if gs.zobristKey != Zobrist.computeHash(gs):
+        raise AssertionError("zobrist key differs from computeHash " + context + ": " + gs.to_fen())
+    if Evaluation.evaluate(gs) != Evaluation.evaluateFromScratch(gs):
+        raise AssertionError("score " + str(Evaluation.evaluate(gs)) + " differs from evaluateFromScratch " +
+                             str(Evaluation.evaluateFromScratch(gs)) + " " + context + ": " + gs.to_fen())
+    if gs.pieceLists != ChessEngine.pieceLists(gs.board):
+        raise AssertionError("piece lists differ from the board " + context + ": " + gs.to_fen())
+
+
+'''
+perft that makes every move down to the leaves and verifies the position after each makeMove and undoMove
+'''
+
+
+def perftVerify(gs, depth, context="at the root"):
+    verifyIncremental(gs, context)
+    if depth == 0:
+        return 1
+    nodes = 0
+    for move in gs.getValidMoves():
+        gs.makeMove(move)
+        nodes += perftVerify(gs, depth - 1, "after making " + move.getLongNotation())
+        gs.undoMove()
+        verifyIncremental(gs, "after undoing " + move.getLongNotation())
+    return nodes
+
+
+'''
+perft split by root move, returns a list of (move in long notation, leaf count)
+'''
+
+
+def divide(gs, depth):
+    results = []
+    for move in gs.getValidMoves():
+        gs.makeMove(move)
+        results.append((move.getLongNotation(), perft(gs, depth - 1)))
+        gs.undoMove()
+    return results
+
+
+def newGameState(fen, bitboards):
+    if bitboards:
+        return Bitboard.BitboardGameState.from_fen(fen)
+    return ChessEngine.GameState.from_fen(fen)
+
+
+'''
+run perft on one position and print nodes, time and nodes per second
+'''
+
+
+def runPerft(fen, depth, bitboards=False, showDivide=False, verify=False):
+    gs = newGameState(fen, bitboards)
+    start = time.perf_counter()
+    if verify:
+        nodes = perftVerify(gs, depth)
+    elif showDivide:
+        results = divide(gs, depth)
+        for notation, count in sorted(results):
+            print(notation + ": " + str(count))
+        nodes = sum(count for _, count in results)
+        print("moves: " + str(len(results)))
+    else:
+        nodes = perft(gs, depth)
+    elapsed = time.perf_counter() - start
+    print("depth " + str(depth) + " nodes " + str(nodes) + " time " + format(elapsed, ".3f") + "s nps " +
+          str(int(nodes / elapsed) if elapsed > 0 else 0))
+    return nodes
+
+
+'''
+check every reference position up to maxNodes expected leaves, returns the number of failures
+verify checks the incremental state at every node as well, much slower as no ply is bulk counted
+'''
+
+
+def runSuite(bitboards=False, maxNodes=SUITE_MAX_NODES, verify=False):
+    failures = 0
+    totalNodes = 0
+    totalTime = 0.0
+    for name, fen, expected in POSITIONS:
+        for depth, count in enumerate(expected, 1):
+            if count > maxNodes:
+                break
+            gs = newGameState(fen, bitboards)
+            start = time.perf_counter()
+            nodes = perftVerify(gs, depth) if verify else perft(gs, depth)
+            elapsed = time.perf_counter() - start
+            totalNodes += nodes
+            totalTime += elapsed
+            status = "ok" if nodes == count else "FAILED, expected " + str(count)
+            if nodes != count:
+                failures += 1
+            print(name + " depth " + str(depth) + ": " + str(nodes) + " " + status + " (" + format(elapsed, ".3f") +
+                  "s)")
+    print(str(failures) + " failures, " + str(totalNodes) + " nodes in " + format(totalTime, ".3f") + "s, nps " +
+          str(int(totalNodes / totalTime) if totalTime > 0 else 0))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="perft for GameState move generation")
+    parser.add_argument("--fen", default=START_FEN)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--divide", action="store_true", help="print the leaf count of every root move")
+    parser.add_argument("--suite", action="store_true", help="check the reference positions")
+    parser.add_argument("--max-nodes", type=int, default=SUITE_MAX_NODES, help="largest expected count in the suite")
+    parser.add_argument("--bitboards", action="store_true", help="use the bitboard backend")
+    parser.add_argument("--verify", action="store_true",
+                        help="check the zobrist key, evaluation and piece lists against a recompute at every node")
+    args = parser.parse_args()
+    if args.suite:
+        raise SystemExit(1 if runSuite(args.bitboards, args.max_nodes, args.verify) else 0)
+    runPerft(args.fen, args.depth, args.bitboards, args.divide, args.verify)
+
+
+if __name__ == "__main__":
+    main()
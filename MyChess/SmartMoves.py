@@ -2,24 +2,47 @@
 --> Generate AI moves
 """
 import random
+import time
+from MyChess import TranspositionTable
+from MyChess import MoveOrdering
+from MyChess import Evaluation
 
 piecesPoints = {"Q": 8, "R": 5, "N": 3, "B": 3, "p": 1, "K": 0}
 CHECKMATE = 10000
 STALEMATE = 0
 DEPTH = 2
+MAX_DEPTH = 32  # iterative deepening stops here even with time left
+QUIESCENCE = True  # extend NegaMax leaves through captures and promotions
+STAGED_MOVES = True  # NegaMax nodes generate their moves stage by stage instead of the parent generating them all
+DELTA_MARGIN = 200  # centipawns, captures that cannot lift the score this close to alpha are skipped
+SEE_PRUNING = True  # quiescence skips captures that lose material by static exchange evaluation
+MATE_SCORE = CHECKMATE - 1000  # scores beyond this are forced mates, selective search leaves them alone
+NULL_MOVE = True  # let the opponent move twice, if the position still fails high the node is cut off
+NULL_MOVE_REDUCTION = 2  # plies taken off the depth of the null move search on top of the move itself
+NULL_MOVE_MIN_DEPTH = 3
+LMR = True  # late move reductions: quiet moves late in the ordering are searched shallower first
+LMR_MIN_DEPTH = 3
+LMR_FULL_MOVES = 3  # moves searched at full depth before reductions start
+LMR_LATE_MOVES = 8  # moves from here on are reduced by two plies instead of one
+FUTILITY = True  # skip quiet moves near the leaves when even the margin cannot lift the static score to alpha
+FUTILITY_MARGINS = (0, 200, 500)  # centipawns by depth left, futility pruning works below len(FUTILITY_MARGINS)
+PVS = True  # principal variation search: moves after the first only get a null window unless they beat alpha
+ASPIRATION = True  # iterations search a window around the previous score first and widen it when the score falls out
+ASPIRATION_WINDOW = 50  # centipawns either side of the previous score, multiplied by 4 on every failure
+ASPIRATION_MIN_DEPTH = 3
+TABLEBASE_PHASE = 8  # the tablebase is only probed from this game phase down, no 4 piece ending has more
+tablebase = None  # a Tablebase.Tablebase set by the caller, searched positions it knows are not searched further
 '''
 Calculate score of board based on material
 '''
 
 
-def scoreMaterial(board):
+def scoreMaterial(gs):
     score = 0
-    for row in board:
-        for square in row:
-            if square[0] == "w":
-                score += piecesPoints[square[1]]
-            elif square[0] == "b":
-                score -= piecesPoints[square[1]]
+    for piece in gs.pieceLists["w"].values():
+        score += piecesPoints[piece[1]]
+    for piece in gs.pieceLists["b"].values():
+        score -= piecesPoints[piece[1]]
     return score
 
 
@@ -60,7 +83,7 @@ def greedyAI(gs, validMoves):
                 elif gs.staleMate:
                     score = STALEMATE
                 else:
-                    score = -turn * scoreMaterial(gs.board)
+                    score = -turn * Evaluation.evaluate(gs)
                 if score > opponentMaxScore:
                     opponentMaxScore = score
                 gs.undoMove()
@@ -74,68 +97,452 @@ def greedyAI(gs, validMoves):
 '''
 Helper method to make the first recursive call
 '''
-def findBestMoveMinMax(gs, validMoves):
-    global nextMove
-    nextMove = None
+def findBestMoveMinMax(gs, validMoves, tt=None):
     random.shuffle(validMoves)
-    findMoveMinMax(gs, validMoves, DEPTH, gs.whiteToMove)
-    return nextMove
+    turnMultiplier = 1 if gs.whiteToMove else -1
+    bestMove = None
+    maxScore = -CHECKMATE - 1
+    for move in validMoves:
+        gs.makeMove(move)
+        score = turnMultiplier * findMoveMinMax(gs, gs.getValidMoves(), DEPTH - 1, gs.whiteToMove, tt)
+        gs.undoMove()
+        if score > maxScore:
+            maxScore = score
+            bestMove = move
+    return bestMove
 
 
 '''
 positive score favours white, negative score favours black
 '''
 def scoreBoard(gs):
-    if gs.checkmate:
+    if gs.checkMate:
         if gs.whiteToMove:
             return -CHECKMATE  # black wins
         else:
             return CHECKMATE  # white wins
-    elif gs.stalemate:
+    elif gs.staleMate:
         return STALEMATE
+    return scoreMaterial(gs)
 
-    score = 0
-    for row in gs.board:
-        for square in row:
-            if square[0] == "w":
-                score += piecesPoints[square[1]]
-            elif square[0] == "b":
-                score -= piecesPoints[square[1]]
-    return score
 
-
-def findMoveMinMax(gs, validMoves, depth, whiteToMove):
-    global nextMove
+'''
+tt is an optional TranspositionTable, scores are stored from the side to move's point of view
+leaves are scored with Evaluation.evaluate like NegaMax, so both pick the same score at the same depth
+'''
+def findMoveMinMax(gs, validMoves, depth, whiteToMove, tt=None):
     if depth == 0:
-        return scoreMaterial(gs.board)
+        return Evaluation.evaluate(gs)
+    if gs.staleMate:
+        return STALEMATE
+    turnMultiplier = 1 if whiteToMove else -1
+    if tt is not None:
+        entry = tt.probe(gs.zobristKey)
+        if entry is not None and entry[0] >= depth and entry[2] == TranspositionTable.EXACT:
+            return turnMultiplier * entry[1]
+    bestMove = None
 
     if whiteToMove:
         maxScore = -CHECKMATE
         for move in validMoves:
-            x = gs.whiteKingLocation
-            y = gs.blackKingLocation
             gs.makeMove(move)
             nextMoves = gs.getValidMoves()
-            score = findMoveMinMax(gs, nextMoves, depth - 1, False)
+            score = findMoveMinMax(gs, nextMoves, depth - 1, False, tt)
             if score > maxScore:
                 maxScore = score
-                if depth == DEPTH:
-                    nextMove = move
+                bestMove = move
             gs.undoMove()
-            gs.whiteKingLocation = x
-            gs.blackKingLocation = y
+        if tt is not None:
+            tt.store(gs.zobristKey, depth, maxScore, TranspositionTable.EXACT, bestMove)
         return maxScore
     else:
         minScore = CHECKMATE
         for move in validMoves:
             gs.makeMove(move)
             nextMoves = gs.getValidMoves()
-            score = findMoveMinMax(gs, nextMoves, depth - 1, True)
+            score = findMoveMinMax(gs, nextMoves, depth - 1, True, tt)
             if score < minScore:
                 minScore = score
-                if depth == DEPTH:
-                    nextMove = move
+                bestMove = move
             gs.undoMove()
+        if tt is not None:
+            tt.store(gs.zobristKey, depth, -minScore, TranspositionTable.EXACT, bestMove)
         return minScore
 
-# def findMoveNegaMax(gs)
\ No newline at end of file
+
+'''
+counters collected during one search
+'''
+class SearchStats():
+    def __init__(self, deadline=None, cancel=None):
+        self.nodes = 0  # every node searched, quiescence nodes included
+        self.qNodes = 0  # nodes searched by quiescence
+        self.tbHits = 0  # nodes scored by the tablebase
+        self.seePruned = 0  # quiescence captures skipped for losing material by static exchange
+        self.nullMoveTries = 0
+        self.nullMoveCutoffs = 0
+        self.lmrReductions = 0  # moves searched at a reduced depth first
+        self.lmrResearches = 0  # reduced moves that beat alpha and were searched again at full depth
+        self.futilityPruned = 0  # quiet moves skipped by futility pruning
+        self.pvsResearches = 0  # null window searches that beat alpha and were searched again with the full window
+        self.aspirationResearches = 0  # iterations searched again because the score fell outside the window
+        self.deadline = deadline  # time.perf_counter() value at which the search gives up
+        self.cancel = cancel  # optional threading.Event, another thread sets it to abort the search
+        self.stopped = False
+
+
+'''
+set the stop flag once the deadline has passed or the search was cancelled
+'''
+def timeUp(stats):
+    if not stats.stopped and ((stats.deadline is not None and time.perf_counter() >= stats.deadline) or
+                              (stats.cancel is not None and stats.cancel.is_set())):
+        stats.stopped = True
+    return stats.stopped
+
+
+'''
+Helper method to make the first NegaMax call
+returns the best move, its score in centipawns from white's point of view and the number of nodes searched
+'''
+def findBestMoveNegaMax(gs, validMoves, depth=DEPTH, tt=None, orderer=None):
+    stats = SearchStats()
+    if orderer is not None:
+        orderer.orderMoves(validMoves, 0, tt.bestMove(gs.zobristKey) if tt is not None else None, gs)
+    bestMove, score = searchRoot(gs, validMoves, depth, stats, tt, orderer)
+    return bestMove, (1 if gs.whiteToMove else -1) * score, stats.nodes
+
+
+'''
+Iterative deepening driver: searches depth 1, 2, 3... until timeLimitMs runs out
+returns the best move of the last completed depth, its score in centipawns from white's point of view,
+that depth, the SearchStats and the principal variation, the list of moves expected from both sides
+orderer is a MoveOrdering.MoveOrderer, a fresh one is used when none is given
+cancel is an optional threading.Event that stops the search like running out of time
+stats is an optional SearchStats to search with instead of timeLimitMs and cancel, another thread may move its deadline
+'''
+def findBestMoveIterative(gs, validMoves, timeLimitMs, tt=None, maxDepth=MAX_DEPTH, orderer=None, cancel=None,
+                          stats=None):
+    if stats is None:
+        stats = SearchStats(time.perf_counter() + timeLimitMs / 1000, cancel)
+    turnMultiplier = 1 if gs.whiteToMove else -1
+    if orderer is None:
+        orderer = MoveOrdering.MoveOrderer(piecesPoints)
+    orderer.newSearch()
+    ttMove = tt.bestMove(gs.zobristKey) if tt is not None else None
+    validMoves = orderer.orderMoves(list(validMoves), 0, ttMove, gs)
+    bestMove = validMoves[0] if len(validMoves) != 0 else None  # played if not even depth 1 completes
+    bestScore = 0
+    completedDepth = 0
+    pv = [bestMove] if bestMove is not None else []
+    for depth in range(1, maxDepth + 1):
+        window = ASPIRATION_WINDOW
+        if ASPIRATION and depth >= ASPIRATION_MIN_DEPTH and abs(bestScore) < MATE_SCORE:
+            alpha, beta = bestScore - window, bestScore + window
+        else:
+            alpha, beta = -CHECKMATE, CHECKMATE
+        while True:
+            move, score = searchRoot(gs, validMoves, depth, stats, tt, orderer, alpha, beta)
+            if stats.stopped:
+                break
+            if score <= alpha and alpha > -CHECKMATE:  # failed low, the real score is lower
+                window *= 4
+                alpha = max(score - window, -CHECKMATE)
+            elif score >= beta and beta < CHECKMATE:  # failed high, the real score is higher
+                window *= 4
+                beta = min(score + window, CHECKMATE)
+            else:
+                break
+            stats.aspirationResearches += 1
+        if stats.stopped or move is None:
+            break
+        bestMove, bestScore, completedDepth = move, score, depth
+        pv = principalVariation(gs, tt, bestMove, depth)
+        validMoves.remove(bestMove)  # principal variation move goes first in the next iteration
+        validMoves.insert(0, bestMove)
+        if abs(bestScore) >= CHECKMATE:  # a forced mate will not change with more depth
+            break
+    return bestMove, turnMultiplier * bestScore, completedDepth, stats, pv
+
+
+'''
+principal variation from gs: firstMove, then the best move the transposition table holds for each position reached,
+until maxLength moves, a position without a legal stored move, or a position seen before
+'''
+def principalVariation(gs, tt, firstMove, maxLength=MAX_DEPTH):
+    pv = []
+    seen = set()
+    move = firstMove
+    while move is not None and len(pv) < maxLength and gs.zobristKey not in seen:
+        seen.add(gs.zobristKey)
+        pv.append(move)
+        gs.makeMove(move)
+        move = None
+        stored = tt.bestMove(gs.zobristKey) if tt is not None else None
+        if stored is not None:
+            validMoves = gs.getValidMoves()
+            if stored in validMoves:  # a different position with the same table slot can leave a stray move
+                move = validMoves[validMoves.index(stored)]
+    for _ in pv:
+        gs.undoMove()
+    return pv
+
+
+'''
+search every root move to depth within the window alpha, beta, returns the best move and its score for the side to move
+a score at or below alpha is only an upper bound and a score at or above beta only a lower bound
+the result is incomplete when stats.stopped is set on return
+'''
+def searchRoot(gs, validMoves, depth, stats, tt=None, orderer=None, alpha=-CHECKMATE, beta=CHECKMATE):
+    stats.nodes += 1
+    turnMultiplier = 1 if gs.whiteToMove else -1
+    alphaOriginal = alpha
+    bestMove = None
+    maxScore = -CHECKMATE - 1  # below a mate, so a move is picked even when every move is mated
+    for i, move in enumerate(validMoves):
+        gs.makeMove(move)
+        nextMoves = childMoves(gs, depth - 1, orderer)
+        score = None
+        if PVS and i != 0:
+            score = -findMoveNegaMaxAlphaBeta(gs, nextMoves, depth - 1, -alpha - 1, -alpha, -turnMultiplier, stats,
+                                              tt, orderer)
+            if alpha < score < beta and not stats.stopped:
+                stats.pvsResearches += 1
+                score = None
+        if score is None:
+            score = -findMoveNegaMaxAlphaBeta(gs, nextMoves, depth - 1, -beta, -alpha, -turnMultiplier, stats, tt,
+                                              orderer)
+        gs.undoMove()
+        if stats.stopped:
+            return bestMove, maxScore
+        if score > maxScore:
+            maxScore = score
+            bestMove = move
+        if maxScore > alpha:
+            alpha = maxScore
+        if alpha >= beta:
+            break
+    if tt is not None:
+        if maxScore <= alphaOriginal:
+            flag = TranspositionTable.UPPER_BOUND
+        elif maxScore >= beta:
+            flag = TranspositionTable.LOWER_BOUND
+        else:
+            flag = TranspositionTable.EXACT
+        tt.store(gs.zobristKey, depth, maxScore, flag, bestMove)
+    return bestMove, maxScore
+
+
+'''
+moves to hand to the NegaMax call of the position just reached, None leaves it to generate them stage by stage
+'''
+def childMoves(gs, depth, orderer):
+    if STAGED_MOVES and orderer is not None:
+        return None
+    return gs.getValidMoves() if depth > 0 else []
+
+
+'''
+NegaMax with alpha-beta pruning, scores are centipawns from the side to move's point of view
+validMoves are the moves of the current position, only needed when depth > 0,
+None generates them lazily with orderer.stagedMoves
+ply is the distance from the root, used by the orderer's killer moves
+allowNull is False right after a null move, so two are never made in a row
+'''
+def findMoveNegaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, turnMultiplier, stats, tt=None, orderer=None, ply=1,
+                             allowNull=True):
+    if tablebase is not None and gs.phase <= TABLEBASE_PHASE:
+        score = probeTablebase(gs, stats)
+        if score is not None:
+            return score
+    if depth == 0 and QUIESCENCE:
+        return quiescence(gs, alpha, beta, turnMultiplier, stats, orderer, ply)
+    stats.nodes += 1
+    if timeUp(stats):
+        return 0
+    if depth == 0:
+        return turnMultiplier * Evaluation.evaluate(gs)
+    if validMoves is not None and len(validMoves) == 0:
+        return -CHECKMATE if gs.inCheck else STALEMATE
+    alphaOriginal = alpha
+    ttMove = None
+    if tt is not None:
+        entry = tt.probe(gs.zobristKey)
+        if entry is not None:
+            entryDepth, entryScore, entryFlag, entryMove = entry
+            if entryDepth >= depth:
+                if entryFlag == TranspositionTable.EXACT:
+                    return entryScore
+                elif entryFlag == TranspositionTable.LOWER_BOUND:
+                    alpha = max(alpha, entryScore)
+                else:
+                    beta = min(beta, entryScore)
+                if alpha >= beta:
+                    return entryScore
+            ttMove = entryMove
+    inCheck = sideInCheck(gs)
+    staticScore = turnMultiplier * Evaluation.evaluate(gs)
+    # null move: passing is allowed neither in check nor with only pawns left, where zugzwang is common
+    if NULL_MOVE and allowNull and not inCheck and depth >= NULL_MOVE_MIN_DEPTH and staticScore >= beta and \
+            abs(beta) < MATE_SCORE and hasPieces(gs):
+        stats.nullMoveTries += 1
+        nullDepth = max(depth - 1 - NULL_MOVE_REDUCTION, 0)
+        gs.makeNullMove()
+        score = -findMoveNegaMaxAlphaBeta(gs, childMoves(gs, nullDepth, orderer), nullDepth, -beta, -beta + 1,
+                                          -turnMultiplier, stats, tt, orderer, ply + 1, False)
+        gs.undoNullMove()
+        if stats.stopped:
+            return 0
+        if score >= beta:
+            stats.nullMoveCutoffs += 1
+            return beta
+    futile = FUTILITY and not inCheck and depth < len(FUTILITY_MARGINS) and abs(alpha) < MATE_SCORE and \
+        staticScore + FUTILITY_MARGINS[depth] <= alpha
+    if validMoves is None:
+        moves = orderer.stagedMoves(gs, ply, ttMove)
+    elif orderer is not None:
+        moves = orderer.orderMoves(validMoves, ply, ttMove, gs)
+    else:
+        moves = validMoves
+        if ttMove is not None and ttMove in validMoves:  # search the stored best move first
+            validMoves.remove(ttMove)
+            validMoves.insert(0, ttMove)
+    maxScore = -CHECKMATE
+    bestMove = None
+    searched = 0
+    for move in moves:
+        quiet = move.pieceCaptured == "--" and not move.isPawnPromotion
+        gs.makeMove(move)
+        reduction = 0
+        lateMove = LMR and not inCheck and depth >= LMR_MIN_DEPTH and searched >= LMR_FULL_MOVES
+        if quiet and searched != 0 and (futile or lateMove) and not sideInCheck(gs):  # checks are searched in full
+            if futile:
+                gs.undoMove()
+                stats.futilityPruned += 1
+                continue
+            reduction = 2 if searched >= LMR_LATE_MOVES and depth > 3 else 1
+        score = None
+        if reduction:  # a shallower null window search proves most late moves are no better than alpha
+            stats.lmrReductions += 1
+            reducedDepth = depth - 1 - reduction
+            score = -findMoveNegaMaxAlphaBeta(gs, childMoves(gs, reducedDepth, orderer), reducedDepth, -alpha - 1,
+                                              -alpha, -turnMultiplier, stats, tt, orderer, ply + 1)
+            if score > alpha and not stats.stopped:
+                stats.lmrResearches += 1
+                score = None
+        if score is None and PVS and searched != 0:  # after the first move a null window shows most are no better
+            score = -findMoveNegaMaxAlphaBeta(gs, childMoves(gs, depth - 1, orderer), depth - 1, -alpha - 1, -alpha,
+                                              -turnMultiplier, stats, tt, orderer, ply + 1)
+            if alpha < score < beta and not stats.stopped:
+                stats.pvsResearches += 1
+                score = None
+        if score is None:
+            score = -findMoveNegaMaxAlphaBeta(gs, childMoves(gs, depth - 1, orderer), depth - 1, -beta, -alpha,
+                                              -turnMultiplier, stats, tt, orderer, ply + 1)
+        gs.undoMove()
+        searched += 1
+        if stats.stopped:  # the score is meaningless, leave the table alone
+            break
+        if score > maxScore:
+            maxScore = score
+            bestMove = move
+        if maxScore > alpha:
+            alpha = maxScore
+        if alpha >= beta:
+            if orderer is not None:
+                orderer.recordCutoff(move, ply, depth, searched - 1)
+            break
+    if validMoves is None:
+        moves.close()  # counts the stages the cutoff saved
+        if searched == 0:
+            return -CHECKMATE if gs.inCheck else STALEMATE
+    if stats.stopped:
+        return 0
+    if tt is not None:
+        if maxScore <= alphaOriginal:
+            flag = TranspositionTable.UPPER_BOUND
+        elif maxScore >= beta:
+            flag = TranspositionTable.LOWER_BOUND
+        else:
+            flag = TranspositionTable.EXACT
+        tt.store(gs.zobristKey, depth, maxScore, flag, bestMove)
+    return maxScore
+
+
+'''
+whether the side to move is in check, worked out without generating its moves
+'''
+def sideInCheck(gs):
+    kingRow, kingCol = gs.whiteKingLocation if gs.whiteToMove else gs.blackKingLocation
+    return gs.squareUnderAttack(kingRow, kingCol)
+
+
+'''
+whether the side to move has a piece other than pawns and its King
+'''
+def hasPieces(gs):
+    for piece in gs.pieceLists["w" if gs.whiteToMove else "b"].values():
+        if piece[1] != "p" and piece[1] != "K":
+            return True
+    return False
+
+
+'''
+exact score of gs for the side to move from the tablebase, None when it has no table for the position
+a win in d plies scores CHECKMATE - d, so shorter mates are preferred and the search keeps making progress
+'''
+def probeTablebase(gs, stats):
+    value = tablebase.probe(gs)
+    if value is None:
+        return None
+    stats.nodes += 1
+    stats.tbHits += 1
+    if value == 0:
+        return STALEMATE
+    return CHECKMATE - (value - 1) if value > 0 else -CHECKMATE - (value + 1)
+
+
+'''
+Quiescence search: past the NegaMax horizon only captures and promotions are searched,
+so a position is never scored in the middle of an exchange
+'''
+def quiescence(gs, alpha, beta, turnMultiplier, stats, orderer=None, ply=1):
+    stats.nodes += 1
+    stats.qNodes += 1
+    if timeUp(stats):
+        return 0
+    standPat = turnMultiplier * Evaluation.evaluate(gs)  # the side to move can usually do at least this well
+    if standPat >= beta:
+        return standPat
+    if standPat > alpha:
+        alpha = standPat
+    maxScore = standPat
+    captures = gs.getCaptureMoves()
+    if orderer is not None:
+        orderer.orderMoves(captures, ply)
+    else:
+        captures.sort(key=lambda m: 10 * piecesPoints[m.pieceCaptured[1]] - piecesPoints[m.pieceMoved[1]]
+                      if m.pieceCaptured != "--" else 0, reverse=True)
+    for move in captures:
+        # delta pruning: even winning the piece for free would not reach alpha
+        if not move.isPawnPromotion and \
+                standPat + Evaluation.PIECE_VALUES[move.pieceCaptured[1]] + DELTA_MARGIN <= alpha:
+            continue
+        # the capture loses material even if the exchange on its square is played out
+        if SEE_PRUNING and not move.isPawnPromotion and \
+                piecesPoints[move.pieceCaptured[1]] < piecesPoints[move.pieceMoved[1]] and \
+                gs.staticExchange(move, piecesPoints) < 0:
+            stats.seePruned += 1
+            continue
+        gs.makeMove(move)
+        score = -quiescence(gs, -beta, -alpha, -turnMultiplier, stats, orderer, ply + 1)
+        gs.undoMove()
+        if stats.stopped:
+            return 0
+        if score > maxScore:
+            maxScore = score
+        if maxScore > alpha:
+            alpha = maxScore
+        if alpha >= beta:
+            break
+    return maxScore
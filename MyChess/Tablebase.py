@@ -0,0 +1,694 @@
+"""
+--> endgame tablebases for 3 and 4 piece endings, built by retrograde analysis
+--> every position stores win, draw or loss plus the distance to mate in plies
+--> positions are numbered by king pair up to board symmetry, so a pawnless table needs 462 king pairs, not 4096
+--> predecessors are found by taking moves back, no move lists are kept while building
+--> the builder has move rules of its own for speed, verify checks them against GameState on random positions
+--> one file per material set, memory mapped when probed
+run from the repository root:
+    python -m MyChess.Tablebase build KQvK KRvK KPvK -d tablebases
+    python -m MyChess.Tablebase build KQvKR KRvKP -d tablebases
+    python -m MyChess.Tablebase probe --fen "8/8/8/4k3/8/8/8/4K2R w - - 0 1" -d tablebases
+    python -m MyChess.Tablebase verify KQvKR KRvKP --positions 2000
+a 3 piece table takes a few seconds and a 4 piece table about five minutes, using some 13 bytes of memory a position,
+so building KRvKP with the four tables it needs takes about twenty minutes
+values are the mate distance in plies plus one, positive when the side to move wins, negative when it loses
+and 0 for a draw, so -1 means checkmated
+"""
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from array import array
+from MyChess import ChessEngine
+from MyChess import Evaluation
+from MyChess import Zobrist
+from MyChess.Bitboard import KING_ATTACKS, KNIGHT_ATTACKS, PAWN_ATTACKS, rookAttacks, bishopAttacks
+
+MAX_PIECES = 4
+MAGIC = b"MCT2"  # 2: positions numbered by symmetry reduced king pair
+HEADER = struct.Struct("<4sI")  # magic and number of positions
+VALUE = struct.Struct("<h")
+ILLEGAL = -32768  # the side not to move is in check, two pieces share a square, or a symmetric copy of a position
+PIECE_ORDER = "QRBNP"  # order of the pieces after the king in a material name
+PROMOTIONS = "QRBN"
+UNKNOWN = 255  # move count not worked out yet
+SOLVED = 1  # flags of a position while building
+EXTERNAL_DRAW = 2  # a capture or promotion reaches a drawn position
+
+'''
+square maps of the board symmetries, as lists giving the image of every square
+a pawn fixes the direction of play, so only the mirror between the a and h files is left
+'''
+
+
+def symmetries(pawns):
+    maps = []
+    for transpose in (False, True):
+        for flipRows in (False, True):
+            for flipCols in (False, True):
+                squareMap = []
+                for sq in range(64):
+                    r, c = divmod(sq, 8)
+                    if transpose:
+                        r, c = c, r
+                    squareMap.append((7 - r if flipRows else r) * 8 + (7 - c if flipCols else c))
+                maps.append(squareMap)
+    return maps[:2] if pawns else maps
+
+
+'''
+king pairs of a symmetry group: the sorted list of canonical (white King, black King) pairs, and for every raw pair
+r * 64 + c the symmetries mapping it to its canonical pair, None when the kings touch or share a square
+'''
+
+
+def kingPairs(squareMaps):
+    transforms = [None] * 4096
+    canonical = set()
+    for whiteKing in range(64):
+        for blackKing in range(64):
+            if whiteKing == blackKing or KING_ATTACKS[whiteKing] >> blackKing & 1:
+                continue
+            images = [(squareMap[whiteKing], squareMap[blackKing]) for squareMap in squareMaps]
+            best = min(images)
+            canonical.add(best)
+            transforms[whiteKing * 64 + blackKing] = [squareMap for squareMap, image in zip(squareMaps, images)
+                                                      if image == best]
+    return sorted(canonical), transforms
+
+
+KING_PAIRS = {pawns: kingPairs(symmetries(pawns)) for pawns in (False, True)}
+ROOK_LINES = [rookAttacks(sq, 0) for sq in range(64)]  # squares a rook on the square attacks on an empty board
+BISHOP_LINES = [bishopAttacks(sq, 0) for sq in range(64)]
+
+
+'''
+numbering of the positions of one material: side to move, canonical king pair, then the squares of the other pieces
+in tablePieces order, pieces of the same kind always in increasing square order
+'''
+
+
+class TableIndex():
+    def __init__(self, material):
+        self.pieces = tablePieces(material)
+        pawns = any(piece[1] == "p" for piece in self.pieces)
+        self.pairs, transforms = KING_PAIRS[pawns]
+        pairIndex = {pair: i for i, pair in enumerate(self.pairs)}
+        # for every raw king pair the symmetries to apply with the number of the canonical pair they give
+        self.transforms = [None if maps is None else
+                           [(squareMap, pairIndex[squareMap[raw // 64], squareMap[raw % 64]]) for squareMap in maps]
+                           for raw, maps in enumerate(transforms)]
+        self.others = len(self.pieces) - 2
+        self.half = len(self.pairs) * 64 ** self.others  # positions with white to move
+        self.count = 2 * self.half
+        self.twins = [i for i in range(1, self.others) if self.pieces[i + 2] == self.pieces[i + 1]]
+
+    '''
+    number of the position with the pieces on squares, in tablePieces order, -1 when the kings touch
+    '''
+    def index(self, whiteToMove, squares):
+        transforms = self.transforms[squares[0] * 64 + squares[1]]
+        if transforms is None:
+            return -1
+        best = -1
+        for squareMap, index in transforms:  # more than one when the king pair is symmetric, the smallest is used
+            if self.twins:
+                others = [squareMap[sq] for sq in squares[2:]]
+                for i in self.twins:
+                    if others[i] < others[i - 1]:
+                        others[i - 1], others[i] = others[i], others[i - 1]
+                for sq in others:
+                    index = index * 64 + sq
+            else:
+                for sq in squares[2:]:
+                    index = index * 64 + squareMap[sq]
+            if best == -1 or index < best:
+                best = index
+        return best if whiteToMove else best + self.half
+
+    '''
+    (white to move, squares) of the position with number index
+    '''
+    def position(self, index):
+        whiteToMove = index < self.half
+        rest = index if whiteToMove else index - self.half
+        others = []
+        for _ in range(self.others):
+            rest, sq = divmod(rest, 64)
+            others.append(sq)
+        others.reverse()
+        return whiteToMove, list(self.pairs[rest]) + others
+
+
+'''
+material name like KRPvKB from the pieces of both sides, without colors and kings
+'''
+
+
+def materialName(whitePieces, blackPieces):
+    return "K" + "".join(sorted(whitePieces, key=PIECE_ORDER.index)) + "vK" + \
+        "".join(sorted(blackPieces, key=PIECE_ORDER.index))
+
+
+'''
+tables are only kept with the stronger side as white, the other color order is mirrored on probing
+'''
+
+
+def isCanonical(whitePieces, blackPieces):
+    def strength(pieces):
+        return sum(Evaluation.PIECE_VALUES["p" if piece == "P" else piece] for piece in pieces), \
+            "".join(sorted(pieces, key=PIECE_ORDER.index))
+    return strength(whitePieces) >= strength(blackPieces)
+
+
+'''
+endings no side can win, they need no table
+'''
+
+
+def isDrawn(whitePieces, blackPieces):
+    pieces = whitePieces + blackPieces
+    return all(piece in "BN" for piece in pieces) and len(pieces) <= 1
+
+
+'''
+white and black piece letters, kings left out, of a material name
+'''
+
+
+def splitMaterial(material):
+    white, black = material.split("v")
+    return list(white[1:]), list(black[1:])
+
+
+'''
+pieces of every position of the table in index order: white King, black King, white pieces, black pieces
+'''
+
+
+def tablePieces(material):
+    whitePieces, blackPieces = splitMaterial(material)
+    return ["wK", "bK"] + ["w" + ("p" if piece == "P" else piece) for piece in whitePieces] + \
+        ["b" + ("p" if piece == "P" else piece) for piece in blackPieces]
+
+
+class Tablebase():
+    def __init__(self, directory):
+        self.directory = directory
+        self.tables = {}  # material name: (mmap, TableIndex), or None when there is no file
+        self.hits = 0
+
+    def path(self, material):
+        return os.path.join(self.directory, material + ".tb")
+
+    def table(self, material):
+        if material not in self.tables:
+            table = None
+            if os.path.exists(self.path(material)):
+                with open(self.path(material), "rb") as file:
+                    data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, count = HEADER.unpack_from(data, 0)
+                tableIndex = TableIndex(material)
+                if magic != MAGIC or count != tableIndex.count:
+                    data.close()
+                    raise ValueError(self.path(material) + " is not a tablebase file of this version")
+                table = (data, tableIndex)
+            self.tables[material] = table
+        return self.tables[material]
+
+    '''
+    value of a position given as a list of (piece, square) with the kings included, None if there is no table
+    '''
+    def lookup(self, pieces, whiteToMove):
+        whitePieces = [piece[1].upper() for piece, _ in pieces if piece[0] == "w" and piece[1] != "K"]
+        blackPieces = [piece[1].upper() for piece, _ in pieces if piece[0] == "b" and piece[1] != "K"]
+        if isDrawn(whitePieces, blackPieces):
+            return 0
+        if not isCanonical(whitePieces, blackPieces):  # swap colors and mirror the board
+            pieces = [(("b" if piece[0] == "w" else "w") + piece[1], (7 - sq // 8) * 8 + sq % 8)
+                      for piece, sq in pieces]
+            whitePieces, blackPieces = blackPieces, whitePieces
+            whiteToMove = not whiteToMove
+        table = self.table(materialName(whitePieces, blackPieces))
+        if table is None:
+            return None
+        data, tableIndex = table
+        squares = []
+        remaining = list(pieces)
+        for piece in tableIndex.pieces:
+            for i, (other, sq) in enumerate(remaining):
+                if other == piece:
+                    squares.append(sq)
+                    del remaining[i]
+                    break
+        index = tableIndex.index(whiteToMove, squares)
+        if index < 0:
+            return None
+        return VALUE.unpack_from(data, HEADER.size + 2 * index)[0]
+
+    '''
+    value of the position of gs for its side to move, None when it has too many pieces or no table
+    tables know neither castling nor en passant, so positions where either is still possible get None as well
+    '''
+    def probe(self, gs):
+        if len(gs.pieceLists["w"]) + len(gs.pieceLists["b"]) > MAX_PIECES:
+            return None
+        if Zobrist.castleIndex(gs.currentCastleRight) != 0 or gs.enpassantPossible != ():
+            return None
+        pieces = [(piece, sq) for color in "wb" for sq, piece in gs.pieceLists[color].items()]
+        value = self.lookup(pieces, gs.whiteToMove)
+        if value is not None:
+            self.hits += 1
+        return value
+
+    def close(self):
+        for table in self.tables.values():
+            if table is not None:
+                table[0].close()
+        self.tables = {}
+
+
+'''
+tables a material needs for its captures and promotions
+'''
+
+
+def dependencies(material):
+    whitePieces, blackPieces = splitMaterial(material)
+    needed = set()
+    for own, other, white in ((whitePieces, blackPieces, True), (blackPieces, whitePieces, False)):
+        for i, piece in enumerate(own):
+            options = [own[:i] + own[i + 1:]]  # the piece is captured
+            if piece == "P":
+                options += [own[:i] + [promoted] + own[i + 1:] for promoted in PROMOTIONS]
+            for changed in options:
+                newWhite, newBlack = (changed, other) if white else (other, changed)
+                if isDrawn(newWhite, newBlack):
+                    continue
+                if not isCanonical(newWhite, newBlack):
+                    newWhite, newBlack = newBlack, newWhite
+                needed.add(materialName(newWhite, newBlack))
+    return needed
+
+
+'''
+bitboard of the squares piece on sq attacks with the given occupancy
+'''
+
+
+def pieceAttacks(piece, sq, occupied):
+    kind = piece[1]
+    if kind == "K":
+        return KING_ATTACKS[sq]
+    if kind == "N":
+        return KNIGHT_ATTACKS[sq]
+    if kind == "p":
+        return PAWN_ATTACKS[piece[0] == "b"][sq]
+    attacks = 0
+    if kind != "B":
+        attacks |= rookAttacks(sq, occupied)
+    if kind != "R":
+        attacks |= bishopAttacks(sq, occupied)
+    return attacks
+
+
+'''
+whether a piece of color attacks target, pieces on square -1 have been captured
+'''
+
+
+def attacked(pieces, squares, target, color, occupied):
+    for piece, sq in zip(pieces, squares):
+        if piece[0] != color or sq < 0:
+            continue
+        bit = 1 << sq
+        kind = piece[1]
+        if kind == "K":
+            if KING_ATTACKS[target] & bit:
+                return True
+        elif kind == "N":
+            if KNIGHT_ATTACKS[target] & bit:
+                return True
+        elif kind == "p":
+            if PAWN_ATTACKS[color == "w"][target] & bit:  # where a pawn of the other color on target would take
+                return True
+        else:
+            if kind != "B" and ROOK_LINES[target] & bit and rookAttacks(target, occupied) & bit:
+                return True
+            if kind != "R" and BISHOP_LINES[target] & bit and bishopAttacks(target, occupied) & bit:
+                return True
+    return False
+
+
+'''
+legal moves of the side to move as (squares after the move, index of the piece moved, promoted piece or None,
+whether it captures), a captured piece is left on square -1; with capturesOnly only captures and promotions
+'''
+
+
+def legalMoves(pieces, squares, whiteToMove, capturesOnly=False):
+    color, enemy = ("w", "b") if whiteToMove else ("b", "w")
+    kingIndex = 0 if whiteToMove else 1
+    occupied = own = 0
+    for piece, sq in zip(pieces, squares):
+        occupied |= 1 << sq
+        if piece[0] == color:
+            own |= 1 << sq
+    moves = []
+    for i, piece in enumerate(pieces):
+        if piece[0] != color:
+            continue
+        sq = squares[i]
+        if piece[1] == "p":
+            forward = -8 if whiteToMove else 8
+            targets = pieceAttacks(piece, sq, occupied) & occupied & ~own
+            if not occupied >> (sq + forward) & 1:
+                targets |= 1 << (sq + forward)
+                if sq // 8 == (6 if whiteToMove else 1) and not occupied >> (sq + 2 * forward) & 1:
+                    targets |= 1 << (sq + 2 * forward)
+        else:
+            targets = pieceAttacks(piece, sq, occupied) & ~own
+        if capturesOnly and not (piece[1] == "p" and sq // 8 == (1 if whiteToMove else 6)):
+            targets &= occupied
+        while targets:
+            end = (targets & -targets).bit_length() - 1
+            targets &= targets - 1
+            after = list(squares)
+            after[i] = end
+            captures = occupied >> end & 1 == 1
+            if captures:
+                after[squares.index(end)] = -1
+            if attacked(pieces, after, after[kingIndex], enemy, occupied & ~(1 << sq) | 1 << end):
+                continue
+            if piece[1] == "p" and (end < 8 or end >= 56):
+                for promoted in PROMOTIONS:
+                    moves.append((after, i, promoted, captures))
+            else:
+                moves.append((after, i, None, captures))
+    return moves
+
+
+'''
+positions from which the side not to move reached the one given by a move that neither captured nor promoted,
+as lists of squares, the side not to move never stands in check in them
+'''
+
+
+def unmoves(pieces, squares, whiteToMove):
+    color = "b" if whiteToMove else "w"  # the side that made the last move
+    kingIndex = 0 if whiteToMove else 1  # King of the side to move, it must not be in check before the move
+    occupied = 0
+    for sq in squares:
+        occupied |= 1 << sq
+    previous = []
+    for i, piece in enumerate(pieces):
+        if piece[0] != color:
+            continue
+        sq = squares[i]
+        if piece[1] == "p":
+            back = 8 if color == "w" else -8
+            origins = 0
+            if 8 <= sq + back < 56 and not occupied >> (sq + back) & 1:
+                origins |= 1 << (sq + back)
+                if sq // 8 == (4 if color == "w" else 3) and not occupied >> (sq + 2 * back) & 1:
+                    origins |= 1 << (sq + 2 * back)
+        else:
+            origins = pieceAttacks(piece, sq, occupied) & ~occupied
+        while origins:
+            start = (origins & -origins).bit_length() - 1
+            origins &= origins - 1
+            before = list(squares)
+            before[i] = start
+            if not attacked(pieces, before, before[kingIndex], color, occupied & ~(1 << sq) | 1 << start):
+                previous.append(before)
+    return previous
+
+
+'''
+number of different positions of this table the legal moves of position index lead to
+'''
+
+
+def childCount(tableIndex, index):
+    whiteToMove, squares = tableIndex.position(index)
+    return len({tableIndex.index(not whiteToMove, after)
+                for after, moved, promoted, captures in legalMoves(tableIndex.pieces, squares, whiteToMove)
+                if promoted is None and not captures})
+
+
+'''
+build the table of material in tablebase.directory, together with the tables it depends on
+'''
+
+
+def generate(tablebase, material, verbose=True):
+    whitePieces, blackPieces = splitMaterial(material)
+    if not isCanonical(whitePieces, blackPieces):
+        raise ValueError(material + " has the weaker side as white, use " +
+                         materialName(blackPieces, whitePieces))
+    if len(whitePieces) + len(blackPieces) + 2 > MAX_PIECES:
+        raise ValueError("tables have at most " + str(MAX_PIECES) + " pieces")
+    for needed in dependencies(material):
+        if not os.path.exists(tablebase.path(needed)):
+            generate(tablebase, needed, verbose)
+    if verbose:
+        print("building " + material)
+    tableIndex = TableIndex(material)
+    pieces = tableIndex.pieces
+    count = tableIndex.count
+    values = array("h", [ILLEGAL]) * count
+    counts = bytearray([UNKNOWN]) * count  # moves inside this table not known to lose yet, worked out when needed
+    winDistance = array("h", [0]) * count  # shortest win found so far for positions not solved yet, 0 for none
+    externalLoss = array("h", [0]) * count  # longest loss over captures and promotions
+    flags = bytearray(count)
+    buckets = {}  # distance: positions to solve at that distance
+    # first pass: legal positions, mates, and the values of captures and promotions from the other tables
+    for index in range(count):
+        whiteToMove, squares = tableIndex.position(index)
+        if len(set(squares)) != len(squares) or tableIndex.index(whiteToMove, squares) != index or \
+                any(piece[1] == "p" and not 8 <= sq < 56 for piece, sq in zip(pieces, squares)):
+            continue
+        occupied = 0
+        for sq in squares:
+            occupied |= 1 << sq
+        ownKing, enemyKing = (squares[0], squares[1]) if whiteToMove else (squares[1], squares[0])
+        color, enemy = ("w", "b") if whiteToMove else ("b", "w")
+        if attacked(pieces, squares, enemyKing, color, occupied):
+            continue
+        values[index] = 0
+        inCheck = attacked(pieces, squares, ownKing, enemy, occupied)
+        moves = legalMoves(pieces, squares, whiteToMove, not inCheck)
+        if inCheck:
+            if len(moves) == 0:
+                values[index] = -1
+                buckets.setdefault(0, array("i")).append(index)
+                continue
+            counts[index] = len({tableIndex.index(not whiteToMove, after) for after, moved, promoted, captures in moves
+                                 if promoted is None and not captures})
+        win = 0
+        draw = False
+        external = False
+        for after, moved, promoted, captures in moves:
+            if promoted is None and not captures:
+                continue
+            external = True
+            childPieces = [(color + promoted if i == moved and promoted is not None else piece, sq)
+                           for i, (piece, sq) in enumerate(zip(pieces, after)) if sq >= 0]
+            value = tablebase.lookup(childPieces, not whiteToMove)
+            if value < 0 and (win == 0 or -value < win):  # the opponent is lost, so this position wins
+                win = -value
+            elif value > 0:
+                externalLoss[index] = max(externalLoss[index], value)
+            elif value == 0:
+                draw = True
+        if win:
+            winDistance[index] = win
+            buckets.setdefault(win, array("i")).append(index)
+        elif draw:
+            flags[index] |= EXTERNAL_DRAW
+        elif external:
+            if counts[index] == UNKNOWN:
+                counts[index] = childCount(tableIndex, index)
+            if counts[index] == 0:  # only captures or promotions, and every one of them loses
+                loss = externalLoss[index]
+                values[index] = -(loss + 1)
+                buckets.setdefault(loss, array("i")).append(index)
+    # retrograde pass, distance by distance from the mates outwards, taking moves back from every solved position
+    distance = 0
+    while len(buckets) != 0:
+        for index in buckets.pop(distance, ()):
+            if flags[index] & SOLVED:
+                continue
+            if values[index] == 0:  # queued as a win
+                if winDistance[index] != distance:
+                    continue  # a shorter win was found after this one was queued
+                values[index] = distance + 1
+            flags[index] |= SOLVED
+            lost = values[index] < 0
+            whiteToMove, squares = tableIndex.position(index)
+            for pred in {tableIndex.index(not whiteToMove, before) for before in unmoves(pieces, squares, whiteToMove)}:
+                if flags[pred] & SOLVED:
+                    continue
+                if lost:  # moving into this loss wins for pred
+                    if winDistance[pred] == 0 or winDistance[pred] > distance + 1:
+                        winDistance[pred] = distance + 1
+                        buckets.setdefault(distance + 1, array("i")).append(pred)
+                elif winDistance[pred] == 0 and values[pred] == 0:
+                    if counts[pred] == UNKNOWN:
+                        counts[pred] = childCount(tableIndex, pred)
+                    counts[pred] -= 1
+                    if counts[pred] == 0 and not flags[pred] & EXTERNAL_DRAW:
+                        # every move loses, pred holds out as long as it can
+                        loss = max(distance + 1, externalLoss[pred])
+                        values[pred] = -(loss + 1)
+                        buckets.setdefault(loss, array("i")).append(pred)
+        distance += 1
+    if verbose:
+        wins = sum(1 for value in values if value > 0)
+        print(material + ": " + str(count) + " positions, " + str(wins) + " wins for the side to move, longest mate " +
+              str(max(values) - 1) + " plies")
+    os.makedirs(tablebase.directory, exist_ok=True)
+    with open(tablebase.path(material), "wb") as file:
+        file.write(HEADER.pack(MAGIC, count))
+        if sys.byteorder == "big":
+            values.byteswap()
+        file.write(values.tobytes())
+    table = tablebase.tables.pop(material, None)
+    if table is not None:
+        table[0].close()
+
+
+'''
+GameState of a position of the table, without castling rights or an en passant square
+'''
+
+
+def gameState(pieces, squares, whiteToMove):
+    board = ["--"] * 64
+    for piece, sq in zip(pieces, squares):
+        board[sq] = piece
+    rows = []
+    for row in range(8):
+        text = ""
+        empty = 0
+        for piece in board[row * 8:row * 8 + 8]:
+            if piece == "--":
+                empty += 1
+                continue
+            if empty != 0:
+                text += str(empty)
+                empty = 0
+            text += piece[1].upper() if piece[0] == "w" else piece[1].lower()
+        rows.append(text + (str(empty) if empty != 0 else ""))
+    return ChessEngine.GameState.from_fen("/".join(rows) + (" w" if whiteToMove else " b") + " - - 0 1")
+
+
+'''
+(squares after move, promoted piece or None) for a GameState move, in the form legalMoves gives
+'''
+
+
+def movedSquares(squares, move):
+    after = list(squares)
+    end = move.endRow * 8 + move.endCol
+    if end in squares:
+        after[squares.index(end)] = -1
+    after[squares.index(move.startRow * 8 + move.startCol)] = end
+    return tuple(after), move.promoteTo if move.isPawnPromotion else None
+
+
+'''
+raise AssertionError when the move rules of the builder disagree with GameState on a legal position of the table:
+legalMoves must give the moves of getValidMoves, every position unmoves gives must reach this one with a quiet move,
+and unmoves of every position a quiet move reaches must give this one back
+returns the number of moves checked
+'''
+
+
+def verifyRules(pieces, squares, whiteToMove):
+    gs = gameState(pieces, squares, whiteToMove)
+    validMoves = gs.getValidMoves()
+    expected = sorted(movedSquares(squares, move) for move in validMoves)
+    found = sorted((tuple(after), promoted) for after, moved, promoted, captures in
+                   legalMoves(pieces, squares, whiteToMove))
+    if found != expected:
+        raise AssertionError("legalMoves differs from getValidMoves: " + gs.to_fen())
+    for before in unmoves(pieces, squares, whiteToMove):
+        previous = gameState(pieces, before, not whiteToMove)
+        if (tuple(squares), None) not in [movedSquares(before, move) for move in previous.getValidMoves()
+                                          if move.pieceCaptured == "--" and not move.isPawnPromotion]:
+            raise AssertionError("unmoves gives " + previous.to_fen() + " that has no quiet move to " + gs.to_fen())
+    for move in validMoves:
+        if move.pieceCaptured == "--" and not move.isPawnPromotion:
+            after = list(movedSquares(squares, move)[0])
+            if squares not in unmoves(pieces, after, not whiteToMove):
+                raise AssertionError("unmoves misses " + gs.to_fen() + " before " + move.getLongNotation())
+    return len(validMoves)
+
+
+'''
+check the move rules of the builder against GameState on count random legal positions of material
+'''
+
+
+def verify(material, count, seed=0):
+    tableIndex = TableIndex(material)
+    pieces = tableIndex.pieces
+    rng = random.Random(seed)
+    checked = moves = 0
+    start = time.perf_counter()
+    while checked < count:
+        whiteToMove, squares = tableIndex.position(rng.randrange(tableIndex.count))
+        if len(set(squares)) != len(squares) or tableIndex.index(whiteToMove, squares) < 0 or \
+                any(piece[1] == "p" and not 8 <= sq < 56 for piece, sq in zip(pieces, squares)):
+            continue
+        other = gameState(pieces, squares, not whiteToMove)
+        other.getValidMoves()
+        if other.inCheck:  # the side not to move stands in check
+            continue
+        moves += verifyRules(pieces, squares, whiteToMove)
+        checked += 1
+    print(material + ": " + str(checked) + " positions and " + str(moves) + " moves agree with GameState (" +
+          format(time.perf_counter() - start, ".3f") + "s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="endgame tablebase generator and probe")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="generate tables, for example KQvK KRvK KPvK")
+    build.add_argument("materials", nargs="+")
+    build.add_argument("-d", "--directory", default="tablebases")
+    probe = commands.add_parser("probe", help="value of a position")
+    probe.add_argument("--fen", required=True)
+    probe.add_argument("-d", "--directory", default="tablebases")
+    check = commands.add_parser("verify", help="check the move rules of the builder against GameState")
+    check.add_argument("materials", nargs="+")
+    check.add_argument("--positions", type=int, default=1000, help="random positions checked for each material")
+    args = parser.parse_args()
+    if args.command == "verify":
+        for material in args.materials:
+            verify(material, args.positions)
+        return
+    tablebase = Tablebase(args.directory)
+    if args.command == "build":
+        for material in args.materials:
+            generate(tablebase, material)
+    else:
+        value = tablebase.probe(ChessEngine.GameState.from_fen(args.fen))
+        if value is None:
+            print("no table")
+        elif value == 0:
+            print("draw")
+        else:
+            print(("win" if value > 0 else "loss") + " for the side to move, mate in " + str(abs(value) - 1) +
+                  " plies")
+    tablebase.close()
+
+
+if __name__ == "__main__":
+    main()
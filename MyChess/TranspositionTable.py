@@ -0,0 +1,105 @@
+"""
+--> fixed size transposition table keyed by the GameState zobrist key
+--> every bucket has a depth preferred slot and an always replace slot
+--> keeps hit, miss and overwrite counters
+"""
+
+EXACT = 0
+LOWER_BOUND = 1  # score is at least the stored score (search failed high)
+UPPER_BOUND = 2  # score is at most the stored score (search failed low)
+ENTRY_BYTES = 96  # rough memory taken by one entry spread over the python lists below
+
+
+class TranspositionTable():
+    def __init__(self, sizeMB=16):
+        buckets = 1
+        while buckets * 4 <= sizeMB * 1024 * 1024 // ENTRY_BYTES:  # 2 slots a bucket, stay inside the budget
+            buckets *= 2
+        self.mask = buckets - 1
+        self.size = buckets * 2
+        # one list per field so an entry costs a few list slots instead of an object
+        self.keys = [0] * self.size
+        self.depths = [-1] * self.size  # -1 marks an empty slot
+        self.scores = [0] * self.size
+        self.flags = [EXACT] * self.size
+        self.moves = [None] * self.size
+        self.hits = 0
+        self.misses = 0
+        self.overwrites = 0
+        self.stores = 0
+
+    '''
+    returns (depth, score, flag, move) stored for key, or None
+    '''
+    def probe(self, key):
+        slot = (key & self.mask) << 1
+        if self.keys[slot] != key or self.depths[slot] < 0:
+            slot += 1
+            if self.keys[slot] != key or self.depths[slot] < 0:
+                self.misses += 1
+                return None
+        self.hits += 1
+        return self.depths[slot], self.scores[slot], self.flags[slot], self.moves[slot]
+
+    '''
+    best move stored for key without touching the counters, or None
+    '''
+    def bestMove(self, key):
+        slot = (key & self.mask) << 1
+        if self.keys[slot] == key and self.depths[slot] >= 0:
+            return self.moves[slot]
+        if self.keys[slot + 1] == key and self.depths[slot + 1] >= 0:
+            return self.moves[slot + 1]
+        return None
+
+    '''
+    save a search result, deeper results keep the first slot and everything else goes to the second
+    '''
+    def store(self, key, depth, score, flag, move):
+        self.stores += 1
+        slot = (key & self.mask) << 1
+        if self.keys[slot] == key or depth >= self.depths[slot]:
+            if self.keys[slot] == key and move is None:
+                move = self.moves[slot]  # keep the old best move when the new result has none
+            elif self.depths[slot] >= 0 and self.keys[slot] != key:
+                self.demote(slot)
+        else:
+            slot += 1
+            if self.keys[slot] == key and move is None:
+                move = self.moves[slot]
+            elif self.depths[slot] >= 0 and self.keys[slot] != key:
+                self.overwrites += 1
+        self.keys[slot] = key
+        self.depths[slot] = depth
+        self.scores[slot] = score
+        self.flags[slot] = flag
+        self.moves[slot] = move
+
+    '''
+    move the depth preferred entry of a bucket into its always replace slot
+    '''
+    def demote(self, slot):
+        if self.depths[slot + 1] >= 0:
+            self.overwrites += 1
+        self.keys[slot + 1] = self.keys[slot]
+        self.depths[slot + 1] = self.depths[slot]
+        self.scores[slot + 1] = self.scores[slot]
+        self.flags[slot + 1] = self.flags[slot]
+        self.moves[slot + 1] = self.moves[slot]
+
+    def clear(self):
+        self.keys = [0] * self.size
+        self.depths = [-1] * self.size
+        self.moves = [None] * self.size
+        self.hits = 0
+        self.misses = 0
+        self.overwrites = 0
+        self.stores = 0
+
+    '''
+    counters for tuning the table size
+    '''
+    def stats(self):
+        probes = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "overwrites": self.overwrites, "stores": self.stores,
+                "hitRate": self.hits / probes if probes else 0.0, "entries": self.size}
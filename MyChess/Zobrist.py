@@ -0,0 +1,77 @@
+"""
+--> zobrist keys used to identify a position with a single 64 bit integer
+--> full recompute of a key, GameState keeps its key up to date incrementally
+"""
+import random
+
+_random = random.Random(20240601)  # fixed seed so keys are the same on every run
+
+
+def _randomKey():
+    return _random.getrandbits(64)
+
+
+PIECE_KEYS = {color + piece: [_randomKey() for _ in range(64)] for color in "wb" for piece in "pNBRQK"}
+CASTLE_KEYS = [_randomKey() for _ in range(16)]  # indexed by castleIndex
+ENPASSANT_KEYS = [_randomKey() for _ in range(8)]  # indexed by file of the en passant square
+SIDE_KEY = _randomKey()  # xored in when black is to move
+
+'''
+castle rights as a 4 bit index: wks 1, wqs 2, bks 4, bqs 8
+'''
+
+
+def castleIndex(castleRights):
+    return castleRights.wks | castleRights.wqs << 1 | castleRights.bks << 2 | castleRights.bqs << 3
+
+
+'''
+compute the key of a position from scratch
+'''
+
+
+def computeHash(gs):
+    key = 0
+    for r in range(8):
+        for c in range(8):
+            piece = gs.board[r][c]
+            if piece != "--":
+                key ^= PIECE_KEYS[piece][r * 8 + c]
+    key ^= CASTLE_KEYS[castleIndex(gs.currentCastleRight)]
+    if gs.enpassantPossible != ():
+        key ^= ENPASSANT_KEYS[gs.enpassantPossible[1]]
+    if not gs.whiteToMove:
+        key ^= SIDE_KEY
+    return key
+
+
+'''
+difference between the keys before and after a move, applying it again takes the move back
+'''
+
+
+def moveDelta(move, enpassantBefore, enpassantAfter, castleBefore, castleAfter):
+    start = move.startRow * 8 + move.startCol
+    end = move.endRow * 8 + move.endCol
+    pieceKeys = PIECE_KEYS[move.pieceMoved]
+    if move.isPawnPromotion:
+        delta = SIDE_KEY ^ pieceKeys[start] ^ PIECE_KEYS[move.pieceMoved[0] + move.promoteTo][end]
+    else:
+        delta = SIDE_KEY ^ pieceKeys[start] ^ pieceKeys[end]
+    if move.isEnpassantMove:
+        delta ^= PIECE_KEYS[move.pieceCaptured][move.startRow * 8 + move.endCol]
+    elif move.pieceCaptured != "--":
+        delta ^= PIECE_KEYS[move.pieceCaptured][end]
+    if move.isCastleMove:
+        rookKeys = PIECE_KEYS[move.pieceMoved[0] + "R"]
+        if move.endCol - move.startCol == 2:  # king side castle
+            delta ^= rookKeys[end + 1] ^ rookKeys[end - 1]
+        else:  # queen side castle
+            delta ^= rookKeys[end - 2] ^ rookKeys[end + 1]
+    if enpassantBefore != ():
+        delta ^= ENPASSANT_KEYS[enpassantBefore[1]]
+    if enpassantAfter != ():
+        delta ^= ENPASSANT_KEYS[enpassantAfter[1]]
+    if castleBefore != castleAfter:
+        delta ^= CASTLE_KEYS[castleBefore] ^ CASTLE_KEYS[castleAfter]
+    return delta